@@ -0,0 +1,4574 @@
+#!/usr/bin/env python3
+import time
+STARTED_AT = time.perf_counter()
+
+import os
+import sys
+import re
+import functools
+from pathlib import Path
+
+# Heavier modules (argparse, subprocess, json, ...) are imported inside the functions that use them,
+# which keeps `mm --help` and `mm task locate` cheap enough to call in shell loops.
+
+# --- Configuration ---
+APP_VERSION = "1.3.0"
+CONFIG_FILES = ["local.properties", ".env", "google-services.json"]
+TASK_TYPES = ["feat", "fix", "refactor", "chore"]
+ANDROID_PACKAGE = "io.github.smithjustinn.androidApp"
+ANDROID_ACTIVITY = ".AppActivity"
+# Point MM_ADB at a script to replay recorded device output instead of talking to a real device
+ADB = os.environ.get("MM_ADB", "adb")
+LOGCAT_BUFFER_LINES = 2000
+STATE_DIR = ".mm"
+CLI_FILES = ("mm.py", "mm_cli.py")
+BENCH_THRESHOLD_PCT = 10.0
+BENCH_BASELINE_REF = "main"
+STARTUP_BUDGET_MS = 50
+DOCTOR_TIMEOUT_SECONDS = 20
+WATCH_DEBOUNCE_MS = 300
+WATCH_POLL_SECONDS = 0.5
+BUILD_TARGETS = ["android", "ios", "desktop", "metadata"]
+# Rough resident memory per Gradle worker / xcodebuild job beyond the daemons' own heaps
+BUILD_WORKER_RAM_BYTES = 1024 ** 3
+XCODE_JOB_RAM_BYTES = 1536 * 1024 ** 2
+SIZE_HISTORY_RUNS = 100
+PERF_STARTUP_RUNS = 10
+TEST_HISTORY_RUNS = 30
+TEST_REPORT_TOP = 10
+# Across commits a test counts as flaky only after this many pass/fail flips; break-then-fix is just two
+FLAKY_MIN_FLIPS = 3
+# ...and one this much slower than its historical median (and by at least the minimum) as a duration regression
+TEST_SLOWDOWN_FACTOR = 2.0
+TEST_SLOWDOWN_MIN_SECONDS = 0.5
+QUARANTINE_RETRIES = 2
+PERF_HISTORY_RUNS = 100
+# A startup median this much slower than the previous commit's is reported as a regression
+PERF_REGRESSION_PCT = 10.0
+PERF_FRAMES_DIR = "build/mm-perf"
+GFXINFO_COUNTERS = {
+    "Total frames rendered": "frames",
+    "Number Missed Vsync": "missed_vsync",
+    "Number High input latency": "high_input_latency",
+    "Number Slow UI thread": "slow_ui_thread",
+    "Number Slow bitmap uploads": "slow_bitmap_uploads",
+    "Number Slow issue draw commands": "slow_draw",
+    "Number Frame deadline missed": "deadline_missed",
+}
+# Absolute download-size budgets per target (None disables) and the allowed growth over the previous build
+SIZE_BUDGET_BYTES = {"android": None, "desktop": None}
+SIZE_GROWTH_BUDGET_PCT = 5.0
+SIZE_ARTIFACTS = {
+    "android": ["androidApp/build/outputs/apk/*/*.apk"],
+    "desktop": ["desktopApp/build/compose/jars/*.jar", "desktopApp/build/libs/*.jar"],
+}
+DB_DEFAULT_ROWS = 1000
+DB_LARGE_TABLE_ROWS = {"leaderboard": 1_000_000}
+DB_QUERY_REPEAT = 20
+CONTEXT_BUDGET_TOKENS = 8000
+# Rough size of a token in source code/diff text; good enough to keep excerpts inside an agent's window
+CONTEXT_CHARS_PER_TOKEN = 4
+KOVER_XML_REPORT = "build/reports/kover/report.xml"
+COVERAGE_BASE_REF = "main"
+TRACE_DIR = "build/mm-traces"
+TRACE_KEEP = 50
+# Long sessions (mm logs, mm watch) run commands for hours; only the most recent events are kept for the trace
+TRACE_MAX_EVENTS = 10000
+GRADLE_LOG_DIR = "build/mm-logs"
+GRADLE_LOG_KEEP = 20
+# Lines of Gradle output replayed when a build fails; the full output only ever lives in the log file
+GRADLE_TAIL_LINES = 40
+# Without a TTY the progress line is printed at most this often instead of redrawn in place
+GRADLE_PROGRESS_INTERVAL_SECONDS = 10
+PROFILE_HISTORY_RUNS = 100
+BUILD_CACHE_PORT = 5071
+BUILD_CACHE_MAX_BYTES = 10 * 1024 ** 3
+BUILD_CACHE_DIR = "~/.cache/mm/gradle-build-cache"
+BUILD_CACHE_INIT_SCRIPT = "build-cache.gradle.kts"
+# Dry-running the default build configures every project and starts the daemon; the metadata compile seeds Kotlin/KSP state
+WARM_STEPS = [
+    ("configuring", [":androidApp:assembleDebug", "--dry-run"]),
+    ("compiling metadata", ["compileCommonMainKotlinMetadata", "--continue"]),
+]
+# Root build files that can change the outcome of every module's tests
+GLOBAL_BUILD_FILES = ["settings.gradle.kts", "build.gradle.kts", "gradle.properties", "gradle/"]
+MODULE_LABELS = {
+    ":shared:core": ("CORE", "Business Logic & Models"),
+    ":shared:data": ("DATA", "Persistence & Network"),
+    ":sharedUI": ("UI", "Compose Components"),
+    ":androidApp": ("PLATFORM", "Android"),
+    ":desktopApp": ("PLATFORM", "Desktop"),
+}
+
+# --- UI / Colors ---
+class Colors:
+    RED = '\033[0;31m'
+    GREEN = '\033[0;32m'
+    YELLOW = '\033[1;33m'
+    BLUE = '\033[0;34m'
+    PURPLE = '\033[0;35m'
+    CYAN = '\033[0;36m'
+    GRAY = '\033[0;90m'
+    BOLD = '\033[1m'
+    ITALIC = '\033[3m'
+    NC = '\033[0m'
+
+ASCII_ART = fr"""{Colors.CYAN}
+   __  __                                __  __       _       _     
+  |  \/  | ___ _ __ ___   ___  _ __ _   _|  \/  | __ _| |_ ___| |__  
+  | |\/| |/ _ \ '_ ` _ \ / _ \| '__| | | | |\/| |/ _` | __/ __| '_ \ 
+  | |  | |  __/ | | | | | (_) | |  | |_| | |  | | (_| | || (__| | | |
+  |_|  |_|\___|_| |_| |_|\___/|_|   \__, |_|  |_|\__,_|\__\___|_| |_|
+                                     |___/                           {Colors.NC}"""
+
+class Spinner:
+    def __init__(self, message="Working..."):
+        import threading
+        self.message = message
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._spin)
+
+    def _spin(self):
+        import shutil
+        chars = "⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏"
+        i = 0
+        while not self.stop_event.is_set():
+            # The message may change while spinning; clip it to one line and erase whatever the last frame left
+            width = shutil.get_terminal_size().columns - 3
+            sys.stdout.write(f"\r{Colors.BLUE}{chars[i % len(chars)]}{Colors.NC} {self.message[:width]}\033[K")
+            sys.stdout.flush()
+            time.sleep(0.1)
+            i += 1
+        sys.stdout.write("\r\033[K")
+        sys.stdout.flush()
+
+    def __enter__(self):
+        if sys.stdout.isatty():
+            self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if sys.stdout.isatty():
+            self.stop_event.set()
+            self.thread.join()
+
+# --- Tracing ---
+
+class Tracer:
+    # Collects Chrome Trace Event "complete" events; open the written file in https://ui.perfetto.dev
+    def __init__(self):
+        from collections import deque
+        self.events = deque(maxlen=TRACE_MAX_EVENTS)
+        self.enabled = os.environ.get("MM_TRACE", "1") != "0"
+
+    def record(self, name, cat, start, end, args=None):
+        if not self.enabled:
+            return
+        import threading
+        self.events.append({
+            "name": name, "cat": cat, "ph": "X",
+            "ts": round((start - STARTED_AT) * 1e6), "dur": round((end - start) * 1e6),
+            "pid": os.getpid(), "tid": threading.get_ident(), "args": args or {},
+        })
+
+    def span(self, name, cat, **args):
+        return _TraceSpan(self, name, cat, args)
+
+    def write(self, label):
+        if not self.enabled or not self.events:
+            return None
+        root = find_project_root()
+        if root is None:
+            return None
+        from datetime import datetime
+        trace_dir = root / TRACE_DIR
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        path = trace_dir / f"mm-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{label}.json"
+        meta = {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": f"mm {' '.join(sys.argv[1:])}"}}
+        save_json(path, {"traceEvents": [meta, *self.events], "displayTimeUnit": "ms"})
+        for old in sorted(trace_dir.glob("mm-*.json"), key=lambda p: p.stat().st_mtime)[:-TRACE_KEEP]:
+            old.unlink(missing_ok=True)
+        return path
+
+class _TraceSpan:
+    def __init__(self, tracer, name, cat, args):
+        self.tracer, self.name, self.cat, self.args = tracer, name, cat, args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.args
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if isinstance(exc_val, SystemExit):
+            self.args.setdefault("exit_code", exc_val.code)
+        elif exc_type is not None:
+            self.args.setdefault("error", exc_type.__name__)
+        self.tracer.record(self.name, self.cat, self.start, time.perf_counter(), self.args)
+        return False
+
+TRACER = Tracer()
+
+def traced(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with TRACER.span(fn.__name__, "handler"):
+            return fn(*args, **kwargs)
+    return wrapper
+
+# --- Utility Functions ---
+
+def validate_task_name(name):
+    if not re.match(r'^[a-zA-Z0-9_-]+$', name):
+        error(f"Invalid task name '{name}'. Only alphanumeric characters, hyphens, and underscores are allowed.")
+    return name
+
+def log(msg, color=Colors.BLUE):
+    print(f"{Colors.GRAY}•{Colors.NC} {color}{Colors.BOLD}{msg}{Colors.NC}")
+
+def success(msg):
+    print(f"{Colors.GREEN}✔{Colors.NC} {Colors.GREEN}{Colors.BOLD}{msg}{Colors.NC}")
+
+def warn(msg):
+    print(f"{Colors.YELLOW}⚠{Colors.NC} {Colors.YELLOW}{Colors.BOLD}{msg}{Colors.NC}")
+
+def error(msg):
+    print(f"{Colors.RED}✘{Colors.NC} {Colors.RED}{Colors.BOLD}{msg}{Colors.NC}")
+    sys.exit(1)
+
+def check_command(cmd):
+    import shutil
+    return shutil.which(cmd) is not None
+
+def run_command(cmd, cwd=None, capture_output=False, shell=False, show_spinner=False, spinner_msg="Running..."):
+    if show_spinner:
+        with Spinner(spinner_msg):
+            return _run_command(cmd, cwd, capture_output, shell)
+    return _run_command(cmd, cwd, capture_output, shell)
+
+def _run_command(cmd, cwd=None, capture_output=False, shell=False):
+    import subprocess
+    argv = cmd if isinstance(cmd, list) else [cmd]
+    with TRACER.span(" ".join(argv[:3]), "subprocess", argv=argv, cwd=str(cwd or "")) as span:
+        try:
+            result = subprocess.run(
+                cmd, 
+                cwd=cwd, 
+                check=True, 
+                text=True, 
+                capture_output=capture_output, 
+                shell=shell
+            )
+            span["exit_code"] = result.returncode
+            return result
+        except subprocess.CalledProcessError as e:
+            span["exit_code"] = e.returncode
+            if not capture_output:
+                error(f"Command failed: {' '.join(cmd) if isinstance(cmd, list) else cmd}")
+            return e
+
+class GradleProgress:
+    # Follows `--console=plain` output: every task prints a "> Task :path" header when it starts, with the
+    # outcome appended when Gradle skipped the work (UP-TO-DATE, FROM-CACHE, NO-SOURCE, SKIPPED).
+    TASK_RE = re.compile(r"> Task (\S+)(?: ([A-Z-]+))?\s*$")
+
+    def __init__(self, expected=None):
+        self.expected = expected
+        self.current = None
+        self.tasks = 0
+        self.outcomes = {}
+        self.configuration_cache = "disabled"
+
+    def feed(self, line):
+        cc = configuration_cache_line(line)
+        if cc and self.configuration_cache != "miss":
+            self.configuration_cache = cc
+        m = self.TASK_RE.match(line)
+        if m:
+            self.tasks += 1
+            self.current = m.group(1)
+            if m.group(2):
+                self.outcomes[m.group(2)] = self.outcomes.get(m.group(2), 0) + 1
+
+    def counts(self):
+        avoided = self.outcomes.get("UP-TO-DATE", 0) + self.outcomes.get("FROM-CACHE", 0)
+        skipped = self.outcomes.get("NO-SOURCE", 0) + self.outcomes.get("SKIPPED", 0)
+        return avoided, self.tasks - avoided - skipped - self.outcomes.get("FAILED", 0)
+
+    def status(self):
+        total = f"/~{self.expected}" if self.expected and self.expected >= self.tasks else ""
+        return (f"[{self.tasks}{total}] {self.current or 'configuring'} "
+                f"({self.outcomes.get('UP-TO-DATE', 0)} up-to-date, {self.outcomes.get('FROM-CACHE', 0)} from cache)")
+
+    def summary(self):
+        avoided, executed = self.counts()
+        ratio = f", {avoided / (avoided + executed) * 100:.0f}% avoided" if avoided + executed else ""
+        return (f"{self.tasks} tasks: {executed} executed, {self.outcomes.get('FROM-CACHE', 0)} from cache, "
+                f"{self.outcomes.get('UP-TO-DATE', 0)} up-to-date{ratio}")
+
+def stream_gradle(cmd, cwd, tasks, msg, show_progress, on_line=None, check=True):
+    import contextlib
+    import subprocess
+    from collections import deque
+    from datetime import datetime
+    root = Path(cwd) if cwd else find_project_root() or scratch_state_dir()
+    log_dir = root / GRADLE_LOG_DIR
+    log_dir.mkdir(parents=True, exist_ok=True)
+    log_path = log_dir / f"gradle-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.log"
+    for old in sorted(log_dir.glob("gradle-*.log"), key=lambda p: p.stat().st_mtime)[:-(GRADLE_LOG_KEEP - 1)]:
+        old.unlink(missing_ok=True)
+    # Remembering how many tasks the same invocation ran last time turns the task counter into rough progress
+    counts_path = get_state_dir(root) / "gradle-task-counts.json"
+    counts = load_json(counts_path, {})
+    key = " ".join(tasks)
+    progress = GradleProgress(counts.get(key))
+    tail = deque(maxlen=GRADLE_TAIL_LINES)
+    tty = sys.stdout.isatty()
+    # A run task (`:desktopApp:run`) hands the terminal to the app, so its console output is shown as it arrives
+    # instead of behind a spinner
+    passthrough = any(t.rsplit(":", 1)[-1] == "run" for t in tasks)
+    if passthrough and show_progress:
+        log(msg)
+        show_progress = False
+    last_print = time.monotonic()
+    with Spinner(msg) if show_progress else contextlib.nullcontext() as spinner, open(log_path, "w") as log_file:
+        if show_progress and not tty:
+            print(msg, flush=True)
+        try:
+            proc = subprocess.Popen(cmd + ["--console=plain"], cwd=cwd, stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT, text=True, errors="replace", bufsize=1)
+        except OSError as e:
+            if check:
+                error(f"Could not start Gradle: {e}")
+            warn(f"Could not start Gradle: {e}")
+            log_file.write(f"Could not start Gradle: {e}\n")
+            res = subprocess.CompletedProcess(cmd, 127)
+            res.configuration_cache, res.log_path = "disabled", log_path
+            return res
+        try:
+            for line in proc.stdout:
+                log_file.write(line)
+                if passthrough:
+                    sys.stdout.write(line)
+                    sys.stdout.flush()
+                tail.append(line)
+                progress.feed(line)
+                if on_line:
+                    on_line(line)
+                if spinner:
+                    spinner.message = f"{msg} {progress.status()}"
+                if show_progress and not tty and time.monotonic() - last_print >= GRADLE_PROGRESS_INTERVAL_SECONDS:
+                    print(f"  {progress.status()}", flush=True)
+                    last_print = time.monotonic()
+            proc.wait()
+        except KeyboardInterrupt:
+            # The terminal already delivered SIGINT to Gradle too; let it shut down before bailing out
+            proc.wait()
+            raise
+    if proc.returncode == 0 and progress.tasks:
+        counts[key] = progress.tasks
+        save_json(counts_path, counts)
+    if show_progress or passthrough:
+        print(f"{Colors.GRAY}•{Colors.NC} {Colors.GRAY}{progress.summary()} "
+              f"(log: {log_path.relative_to(root)}){Colors.NC}")
+    if proc.returncode != 0:
+        if not passthrough:
+            print(f"{Colors.GRAY}--- last {len(tail)} lines of {log_path} ---{Colors.NC}")
+            sys.stdout.write("".join(tail))
+        if check:
+            error(f"Gradle failed with exit code {proc.returncode}"
+                  f"{f' in {progress.current}' if progress.current else ''}. Full log: {log_path}")
+    res = subprocess.CompletedProcess(cmd, proc.returncode)
+    res.configuration_cache, res.log_path = progress.configuration_cache, log_path
+    return res
+
+def run_gradle(tasks, params=None, show_spinner=True, msg="Gradle executing...", cwd=None, capture_output=False,
+               profile=False, on_line=None, check=True):
+    cmd = ["./gradlew"] + gradle_init_args(cwd) + tasks
+    if params:
+        cmd.extend(params)
+    if profile:
+        cmd.append("--profile")
+        profile_state = snapshot_profile_state(cwd)
+    with TRACER.span(f"gradle {' '.join(t for t in tasks if t.startswith(':') or not t.startswith('-'))}", "gradle",
+                     tasks=tasks, params=params or []) as span:
+        if capture_output:
+            res = run_command(cmd, cwd=cwd, capture_output=True, show_spinner=show_spinner, spinner_msg=msg)
+        else:
+            res = stream_gradle(cmd, cwd, tasks, msg, show_spinner, on_line, check)
+        span["exit_code"] = res.returncode
+    if profile:
+        if capture_output:
+            progress = GradleProgress()
+            for line in (res.stdout or "").splitlines():
+                progress.feed(line)
+            res.configuration_cache = progress.configuration_cache
+        ingest_gradle_profile(tasks, profile_state, cwd, res.configuration_cache)
+    return res
+
+TIMINGS = {}
+
+def find_git_dirs(start=None):
+    # Mirrors git's own discovery (a `.git` dir, or a `.git` file pointing at a worktree gitdir) without a subprocess
+    start = Path(start or os.getcwd()).resolve()
+    for d in (start, *start.parents):
+        dotgit = d / ".git"
+        if dotgit.is_dir():
+            return d, dotgit, dotgit
+        if dotgit.is_file():
+            content = dotgit.read_text().strip()
+            if not content.startswith("gitdir:"):
+                return None
+            gitdir = (d / content[len("gitdir:"):].strip()).resolve()
+            commondir_file = gitdir / "commondir"
+            commondir = (gitdir / commondir_file.read_text().strip()).resolve() if commondir_file.exists() else gitdir
+            return d, gitdir, commondir
+    return None
+
+def list_worktree_paths():
+    # What `git worktree list` prints, read straight from the git dir: `mm task locate` runs in shell loops,
+    # and spawning git costs more than the rest of the command
+    dirs = find_git_dirs()
+    if not dirs:
+        import subprocess
+        res = subprocess.run(["git", "worktree", "list", "--porcelain"], capture_output=True, text=True)
+        return [line.split(" ", 1)[1] for line in res.stdout.splitlines() if line.startswith("worktree ")]
+    commondir = dirs[2]
+    paths = [str(commondir.parent)]
+    for gitdir_file in sorted((commondir / "worktrees").glob("*/gitdir")):
+        try:
+            paths.append(str(Path(gitdir_file.read_text().strip()).parent))
+        except OSError:
+            continue
+    return paths
+
+def gradle_init_args(cwd=None):
+    # Init scripts mm generated for this worktree (e.g. the shared build cache) ride along on every build
+    init_dir = (Path(cwd) if cwd else get_project_root()) / STATE_DIR / "init.d"
+    if not init_dir.is_dir():
+        return []
+    return [arg for script in sorted(init_dir.glob("*.gradle.kts")) for arg in ("-I", str(script))]
+
+@functools.lru_cache(maxsize=None)
+def find_project_root():
+    started = time.perf_counter()
+    dirs = find_git_dirs()
+    if dirs:
+        root = dirs[0]
+    else:
+        try:
+            res = run_command(["git", "rev-parse", "--show-toplevel"], capture_output=True)
+            root = Path(res.stdout.strip()) if res.returncode == 0 else None
+        except Exception:
+            root = None
+    TIMINGS["project_root"] = (time.perf_counter() - started) * 1000
+    return root
+
+def get_project_root():
+    # Outside a repository commands work from the current directory, but leave no traces or state behind in it
+    return find_project_root() or Path(os.getcwd())
+
+def get_worktrees_dir():
+    return get_project_root().parent / "worktrees"
+
+def safe_path_join(base, *paths):
+    try:
+        # Resolve the base directory to an absolute path
+        base_resolved = base.resolve()
+
+        # Join the paths and resolve the final path
+        final_path = base.joinpath(*paths).resolve()
+
+        # Check if the final path is within the base directory
+        # We check if base_resolved is a parent of final_path
+        # OR if they are the same directory (though unlikely for a task)
+        if base_resolved != final_path and base_resolved not in final_path.parents:
+            error(f"Security Error: Path traversal detected. Target '{final_path}' is outside '{base_resolved}'.")
+
+        return final_path
+    except Exception as e:
+        error(f"Invalid path: {e}")
+
+def file_digest(path):
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def config_file_sources():
+    sources = {}
+    for f in CONFIG_FILES:
+        src = get_project_root() / f
+        if src.exists():
+            sources[f] = (src, file_digest(src))
+    return sources
+
+def sync_config_files(target_dir, sources, recorded=None):
+    import shutil
+    recorded = recorded or {}
+    copied, skipped, entries = [], [], {}
+    for name, (src, digest) in sources.items():
+        dst = target_dir / name
+        try:
+            st = dst.stat()
+        except FileNotFoundError:
+            st = None
+        rec = recorded.get(name)
+        if st and rec and rec["digest"] == digest and rec["mtime_ns"] == st.st_mtime_ns and rec["size"] == st.st_size:
+            unchanged = True
+        else:
+            unchanged = st is not None and file_digest(dst) == digest
+        if unchanged:
+            skipped.append(name)
+        else:
+            # Same-directory temp file + rename: readers never see a partially written config
+            tmp = dst.with_name(f".{dst.name}.mm-sync.tmp")
+            shutil.copyfile(src, tmp)
+            shutil.copymode(src, tmp)
+            os.replace(tmp, dst)
+            st = dst.stat()
+            copied.append(name)
+        entries[name] = {"digest": digest, "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+    return copied, skipped, entries
+
+def copy_config_files(target_dir):
+    return sync_config_files(target_dir, config_file_sources())
+
+def get_state_dir(root=None):
+    root = root or find_project_root()
+    if root is None:
+        return scratch_state_dir()
+    path = root / STATE_DIR
+    path.mkdir(exist_ok=True)
+    return path
+
+@functools.lru_cache(maxsize=None)
+def scratch_state_dir():
+    # Without a repository there is nowhere state belongs: caches and histories go to a directory that is removed
+    # when mm exits
+    import atexit
+    import shutil
+    import tempfile
+    path = Path(tempfile.mkdtemp(prefix="mm-state-"))
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+def load_json(path, default):
+    import json
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def save_json(path, data):
+    import json
+    # Write to a sibling temp file first so an interrupted run never leaves half a history file behind
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def get_head_sha(cwd=None):
+    res = run_command(["git", "rev-parse", "HEAD"], cwd=cwd, capture_output=True)
+    return res.stdout.strip() if res.returncode == 0 else None
+
+def is_tree_dirty(cwd=None):
+    res = run_command(["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd, capture_output=True)
+    return bool(res.stdout.strip()) if res.returncode == 0 else False
+
+def iter_source_files(root, suffix=".kt"):
+    skip = {"build", ".gradle", ".git", ".idea", ".kotlin", STATE_DIR}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in skip]
+        for name in filenames:
+            if name.endswith(suffix):
+                yield Path(dirpath) / name
+
+def read_kotlin_package(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            m = re.match(r"\s*package\s+([\w.]+)", line)
+            if m:
+                return m.group(1)
+    return ""
+
+# --- Command Handlers ---
+
+@traced
+def handle_build(args):
+    target = args.target
+    gradle_args = args.params or []
+    # `mm build android desktop`: extra target names arrive at the front of the pass-through params
+    targets = [target]
+    while gradle_args and gradle_args[0] in BUILD_TARGETS + ["all"]:
+        targets.append(gradle_args.pop(0))
+    if len(targets) > 1 or target == "all":
+        run_multi_build(targets, args, gradle_args)
+        return
+    
+    if args.release:
+        gradle_args.append("-Prelease=true")
+    
+    tasks = []
+    if args.clean:
+        tasks.append("clean")
+
+    log(f"Building {target}...")
+    
+    if target == "android":
+        task = ":androidApp:assembleRelease" if args.release else ":androidApp:assembleDebug"
+        if args.run:
+            task = ":androidApp:installDebug"
+        
+        tasks.append(task)
+        run_gradle(tasks, params=gradle_args, msg=f"Building Android ({'Release' if args.release else 'Debug'})...",
+                   profile=args.profile)
+        if args.size:
+            check_artifact_size("android")
+        
+        if args.run:
+            log("Launching Android app...")
+            run_command([ADB, "shell", "am", "start", "-n", f"{ANDROID_PACKAGE}/{ANDROID_PACKAGE}{ANDROID_ACTIVITY}"])
+            if args.log:
+                handle_android_logs(args)
+                
+    elif target == "ios":
+        if sys.platform != "darwin":
+            error("iOS builds require macOS.")
+        config = "Release" if args.release else "Debug"
+        log(f"Building iOS for Simulator ({config})...")
+        run_command([
+            "xcodebuild", "-project", "iosApp/iosApp.xcodeproj", 
+            "-scheme", "iosApp", "-sdk", "iphonesimulator", 
+            "-configuration", config, "build"
+        ], show_spinner=True, spinner_msg=f"Building iOS ({config})...")
+        
+    elif target == "desktop":
+        task = ":desktopApp:run" if args.run else ":desktopApp:assemble"
+        tasks.append(task)
+        run_gradle(tasks, params=gradle_args, msg=f"Building Desktop...", profile=args.profile)
+        if args.size:
+            check_artifact_size("desktop")
+        
+    elif target == "metadata":
+        run_gradle([":sharedUI:compileCommonMainKotlinMetadata"], params=gradle_args, msg="Compiling KMP Metadata...",
+                   profile=args.profile)
+
+def gradle_build_task(target, release):
+    return {
+        "android": ":androidApp:assembleRelease" if release else ":androidApp:assembleDebug",
+        "desktop": ":desktopApp:assemble",
+        "metadata": ":sharedUI:compileCommonMainKotlinMetadata",
+    }.get(target)
+
+def plan_build_concurrency(with_xcode):
+    # The Gradle and Kotlin daemons reserve their -Xmx up front, so only the RAM beyond that is available for
+    # parallel workers; xcodebuild gets its own slice of the cores when it runs alongside.
+    cores = os.cpu_count() or 2
+    total, available = read_memory_bytes()
+    props = read_properties(get_project_root() / "gradle.properties")
+    heaps = sum(parse_xmx_bytes(props.get(key)) or 0 for key in ("org.gradle.jvmargs", "kotlin.daemon.jvmargs"))
+    spare = (available or total or 0) - heaps
+    xcode_jobs = max(1, cores // 3) if with_xcode else 0
+    concurrent = with_xcode and (total is None or spare >= XCODE_JOB_RAM_BYTES * xcode_jobs)
+    if with_xcode and total is not None and not concurrent:
+        xcode_jobs = max(1, min(xcode_jobs, int(spare // XCODE_JOB_RAM_BYTES)))
+        concurrent = spare >= XCODE_JOB_RAM_BYTES
+    gradle_cores = cores - xcode_jobs if concurrent else cores
+    workers = gradle_cores
+    if total is not None:
+        ram_left = spare - (XCODE_JOB_RAM_BYTES * xcode_jobs if concurrent else 0)
+        workers = min(gradle_cores, int(ram_left // BUILD_WORKER_RAM_BYTES))
+    return {"cores": cores, "total": total, "available": available, "heaps": heaps, "workers": max(1, workers),
+            "xcode_jobs": xcode_jobs, "concurrent": concurrent}
+
+def run_multi_build(targets, args, gradle_args):
+    import subprocess
+    import threading
+    if "all" in targets:
+        targets = [t for t in BUILD_TARGETS if t != "ios" or sys.platform == "darwin"]
+    targets = list(dict.fromkeys(targets))
+    if "ios" in targets and sys.platform != "darwin":
+        error("iOS builds require macOS.")
+    if args.run or args.log:
+        error("--run/--log only work with a single target.")
+    if args.release:
+        gradle_args.append("-Prelease=true")
+    gradle_targets = [t for t in targets if gradle_build_task(t, args.release)]
+    plan = plan_build_concurrency("ios" in targets)
+    gib = 1024 ** 3
+    log(f"Building {', '.join(targets)}: {plan['cores']} cores"
+        + (f", {plan['available'] / gib:.1f} GiB free with {plan['heaps'] / gib:.0f} GiB reserved for daemon heaps"
+           if plan["available"] else "") + f" -> Gradle --max-workers={plan['workers']}"
+        + (f", xcodebuild -jobs {plan['xcode_jobs']} {'alongside' if plan['concurrent'] else 'afterwards'}"
+           if "ios" in targets else ""))
+
+    results = {}
+    root = get_project_root()
+    log_dir = root / GRADLE_LOG_DIR
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    def gradle_job():
+        final_tasks = {gradle_build_task(t, args.release): t for t in gradle_targets}
+        tasks = (["clean"] if args.clean else []) + list(final_tasks)
+        started = time.perf_counter()
+        finished_at, failed = {}, set()
+
+        def on_line(line):
+            m = re.match(r"> Task (\S+)", line)
+            if m and m.group(1) in final_tasks:
+                finished_at[final_tasks[m.group(1)]] = time.perf_counter() - started
+            m = re.search(r"Execution failed for task '(:[^:']+)", line)
+            if m:
+                failed.update(t for t in gradle_targets if gradle_build_task(t, args.release).startswith(m.group(1) + ":"))
+
+        res = run_gradle(tasks, ["--continue", f"--max-workers={plan['workers']}"] + gradle_args,
+                         msg=f"Building {', '.join(gradle_targets)}...", profile=args.profile, on_line=on_line,
+                         check=False)
+        total = time.perf_counter() - started
+        for t in gradle_targets:
+            # With --continue a failure in one target's task graph leaves the others' results intact
+            ok = res.returncode == 0 or (t not in failed and t in finished_at)
+            results[t] = {"builder": "gradle", "ok": ok, "seconds": finished_at.get(t, total), "log": res.log_path}
+
+    def xcode_job():
+        config = "Release" if args.release else "Debug"
+        log_path = log_dir / "build-xcode.log"
+        started = time.perf_counter()
+        with TRACER.span("xcodebuild", "subprocess", config=config) as span, open(log_path, "w") as log_file:
+            try:
+                code = subprocess.run(["xcodebuild", "-project", "iosApp/iosApp.xcodeproj", "-scheme", "iosApp",
+                                       "-sdk", "iphonesimulator", "-configuration", config,
+                                       "-jobs", str(plan["xcode_jobs"]), "build"],
+                                      cwd=root, stdout=log_file, stderr=subprocess.STDOUT).returncode
+            except OSError as e:
+                log_file.write(f"Could not start xcodebuild: {e}\n")
+                code = 127
+            span["exit_code"] = code
+        results["ios"] = {"builder": "xcodebuild", "ok": code == 0, "seconds": time.perf_counter() - started,
+                          "log": log_path}
+
+    # Gradle runs in the foreground so its live progress owns the terminal; xcodebuild either shares the
+    # machine from a background thread or, when RAM is short, runs once Gradle is done.
+    started = time.perf_counter()
+    xcode = threading.Thread(target=xcode_job) if "ios" in targets else None
+    if xcode and (plan["concurrent"] or not gradle_targets):
+        xcode.start()
+    if gradle_targets:
+        gradle_job()
+    if xcode:
+        if xcode.ident is None:
+            xcode.start()
+        with Spinner("Building ios with xcodebuild..."):
+            xcode.join()
+    wall = time.perf_counter() - started
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- BUILD SUMMARY ---{Colors.NC}")
+    # Gradle targets share one invocation, so their time is when the target's final task finished
+    print(f" {Colors.BOLD}{'Target':10} {'Builder':11} {'Status':8} {'Time':>8}{Colors.NC}")
+    for t in targets:
+        # A builder that crashed before reporting counts as failed rather than breaking the summary
+        r = results.setdefault(t, {"builder": "xcodebuild" if t == "ios" else "gradle", "ok": False, "seconds": wall,
+                                   "log": None})
+        status = f"{Colors.GREEN}ok      {Colors.NC}" if r["ok"] else f"{Colors.RED}FAILED  {Colors.NC}"
+        log_hint = f" {Colors.GRAY}{r['log'].relative_to(root)}{Colors.NC}" if not r["ok"] and r["log"] else ""
+        print(f" {t:10} {r['builder']:11} {status} {r['seconds']:7.1f}s{log_hint}")
+    print(f" {Colors.BOLD}{'Wall time':31} {wall:7.1f}s{Colors.NC}")
+    if not all(results[t]["ok"] for t in targets):
+        error("Some targets failed to build.")
+    if args.size:
+        for t in targets:
+            if t in SIZE_ARTIFACTS:
+                check_artifact_size(t)
+    success("All targets built.")
+
+@traced
+def handle_android_logs(args):
+    log("Streaming Android logs...")
+    if not check_command(ADB):
+        error(f"'{ADB}' not found. Install platform-tools or set MM_ADB.")
+    pkg = ANDROID_PACKAGE
+    tracker = AppPidTracker(pkg)
+    tracker.refresh()
+    if tracker.pid:
+        log(f"Attached to {pkg} (pid {tracker.pid})")
+    else:
+        warn(f"{pkg} is not running yet; waiting for it to start...")
+
+    include = [re.compile(r) for r in (args.include or [])]
+    exclude = [re.compile(r) for r in (args.exclude or [])]
+    recorder = CrashRecorder(get_project_root() / "build" / "mm-logs", args.buffer)
+    stats = {}
+    span = [None, None]
+    tracker.start_polling()
+    try:
+        for entry in parse_logcat(stream_logcat([ADB, "logcat", "-v", "threadtime"])):
+            previous = tracker.pid
+            if tracker.observe(entry):
+                state = "restarted; re-attached" if previous else "started; attached"
+                log(f"{pkg} {state} to pid {tracker.pid}")
+            dump = recorder.observe(entry, tracker.pid)
+            if dump:
+                warn(f"Crash/ANR detected, last {args.buffer} lines saved to {dump}")
+            if entry.pid != tracker.pid:
+                continue
+            stats[entry.tag] = stats.get(entry.tag, 0) + 1
+            span[0] = span[0] or entry.time
+            span[1] = entry.time
+            if args.filter and entry.tag != args.filter:
+                continue
+            text = entry.raw
+            if include and not any(r.search(text) for r in include):
+                continue
+            if any(r.search(text) for r in exclude):
+                continue
+            print_logcat_entry(entry)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tracker.stop_polling()
+        recorder.close()
+    print_logcat_stats(stats, logcat_seconds(span[1]) - logcat_seconds(span[0]) if span[0] else 0)
+
+# --- Logcat ---
+
+LOGCAT_RE = re.compile(r"^(\d\d-\d\d \d\d:\d\d:\d\d\.\d+)\s+(\d+)\s+(\d+)\s+([VDIWEFA])\s+(.*?)\s*: ?(.*)$")
+LOGCAT_LEVEL_COLORS = {"V": Colors.GRAY, "D": Colors.BLUE, "I": Colors.GREEN, "W": Colors.YELLOW,
+                       "E": Colors.RED, "F": Colors.RED, "A": Colors.RED}
+CRASH_TAIL_LINES = 200
+
+class LogcatEntry:
+    __slots__ = ("time", "pid", "tid", "level", "tag", "message", "raw")
+
+    def __init__(self, time_, pid, tid, level, tag, message, raw):
+        self.time, self.pid, self.tid, self.level = time_, pid, tid, level
+        self.tag, self.message, self.raw = tag, message, raw
+
+def stream_logcat(cmd):
+    import subprocess
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True, errors="replace", bufsize=1)
+    try:
+        for line in proc.stdout:
+            yield line.rstrip("\n")
+    finally:
+        if proc.poll() is None:
+            proc.terminate()
+        proc.wait()
+
+def logcat_seconds(stamp):
+    # threadtime stamps carry no year; a leap year keeps 02-29 parseable
+    from datetime import datetime
+    return datetime.strptime(f"2000-{stamp}", "%Y-%m-%d %H:%M:%S.%f").timestamp()
+
+def parse_logcat(lines):
+    for line in lines:
+        m = LOGCAT_RE.match(line)
+        # Buffer separators ("--------- beginning of main") and malformed lines are dropped
+        if m:
+            yield LogcatEntry(m.group(1), m.group(2), m.group(3), m.group(4), m.group(5), m.group(6), line)
+
+class AppPidTracker:
+    POLL_SECONDS = 2.0
+
+    def __init__(self, package):
+        import threading
+        self.package = package
+        self.pid = None
+        self.start_re = re.compile(r"Start proc (\d+):" + re.escape(package) + r"(?:/|\s|$)")
+        self.death_re = re.compile(r"Process " + re.escape(package) + r" \(pid (\d+)\) has died")
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._poll, daemon=True)
+
+    def refresh(self):
+        import subprocess
+        # Bypasses run_command on purpose: a poll every few seconds for hours would crowd everything else out of the trace
+        res = subprocess.run([ADB, "shell", "pidof", "-s", self.package], capture_output=True, text=True)
+        pid = (res.stdout or "").strip()
+        if pid.isdigit():
+            self.pid = pid
+
+    def _poll(self):
+        # Catches restarts that ActivityManager did not log (or that happened before logcat caught up)
+        while not self.stop_event.wait(self.POLL_SECONDS):
+            try:
+                self.refresh()
+            except OSError:
+                return
+
+    def start_polling(self):
+        self.thread.start()
+
+    def stop_polling(self):
+        self.stop_event.set()
+
+    def observe(self, entry):
+        m = self.start_re.search(entry.message)
+        if m and m.group(1) != self.pid:
+            self.pid = m.group(1)
+            return True
+        m = self.death_re.search(entry.message)
+        if m and m.group(1) == self.pid:
+            self.pid = None
+        return False
+
+class CrashRecorder:
+    def __init__(self, out_dir, size):
+        from collections import deque
+        self.out_dir = out_dir
+        self.buffer = deque(maxlen=size)
+        self.file = None
+        self.tail = 0
+        self.crash_pid = None
+
+    def _is_crash(self, entry):
+        if entry.tag == "AndroidRuntime" and entry.message.startswith("FATAL EXCEPTION"):
+            return True
+        if entry.tag == "DEBUG" and entry.message.startswith("*** ***"):
+            return True
+        return entry.tag == "ActivityManager" and entry.message.startswith(f"ANR in {ANDROID_PACKAGE}")
+
+    def observe(self, entry, pid):
+        relevant = entry.pid == (self.crash_pid if self.file else pid) or \
+            entry.tag in ("AndroidRuntime", "DEBUG", "ActivityManager")
+        if self.file and relevant:
+            # Keep writing after the trigger so the stack trace that follows lands in the same dump, until the
+            # crashed process is gone (the tracker has moved off its pid) so a restart's lines stay out of it
+            self.file.write(entry.raw + "\n")
+            self.tail -= 1
+            if self.tail <= 0 or pid != self.crash_pid:
+                self.close()
+        if entry.pid == pid:
+            self.buffer.append(entry.raw)
+        if self.file or not self._is_crash(entry):
+            return None
+        from datetime import datetime
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        path = self.out_dir / f"crash-{datetime.now().strftime('%Y%m%d-%H%M%S')}.log"
+        self.file = open(path, "w")
+        self.file.writelines(line + "\n" for line in self.buffer)
+        if entry.pid != pid:
+            self.file.write(entry.raw + "\n")
+        self.file.flush()
+        self.tail = CRASH_TAIL_LINES
+        self.crash_pid = pid
+        return path
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+def print_logcat_entry(entry):
+    color = LOGCAT_LEVEL_COLORS.get(entry.level, Colors.NC)
+    print(f"{Colors.GRAY}{entry.time[6:]}{Colors.NC} {color}{entry.level}{Colors.NC} "
+          f"{Colors.CYAN}{entry.tag:20.20}{Colors.NC} {color}{entry.message}{Colors.NC}")
+
+def print_logcat_stats(stats, elapsed):
+    # `elapsed` is the span of the log timestamps, so replayed or backlogged output gets its real rate
+    if not stats:
+        return
+    elapsed = max(elapsed, 1e-3)
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- LOG RATE BY TAG ({elapsed:.0f}s of log) ---{Colors.NC}")
+    for tag, count in sorted(stats.items(), key=lambda kv: kv[1], reverse=True)[:15]:
+        print(f" {Colors.CYAN}{tag:30.30}{Colors.NC} {count:8} lines {Colors.GRAY}{count / elapsed:8.1f}/s{Colors.NC}")
+
+@traced
+def handle_test(args):
+    if args.module == "report":
+        handle_test_report(args)
+        return
+    if args.shards:
+        if args.shards < 1:
+            error("--shards must be at least 1.")
+        if args.module in ("android", "desktop"):
+            error("--shards only applies to the JVM suites of the shared KMP modules.")
+        graph = read_module_graph(get_project_root())
+        modules = affected_modules(graph, args.base) if args.changed else sorted(graph)
+        run_sharded_tests(graph, modules, args.shards, quarantine_params(args.quarantine))
+        return
+
+    if args.changed:
+        tasks = changed_test_tasks(args.base)
+        if not tasks:
+            success(f"No modules affected by changes against {args.base}; nothing to test.")
+            return
+        run_gradle(tasks, quarantine_params(args.quarantine), msg=f"Executing {len(tasks)} affected test suites...",
+                   profile=args.profile)
+        success("Tests completed successfully.")
+        if args.quarantine == "retry":
+            retry_quarantined(tasks)
+        return
+
+    log(f"Running tests for module: {args.module}...")
+    tasks = []
+    if args.module == "all":
+        tasks = [":sharedUI:allTests", ":androidApp:testDebugUnitTest", ":desktopApp:test"]
+    elif args.module == "shared":
+        tasks = [":sharedUI:allTests"]
+    elif args.module == "android":
+        tasks = [":androidApp:testDebugUnitTest"]
+    elif args.module == "desktop":
+        tasks = [":desktopApp:test"]
+    
+    run_gradle(tasks, quarantine_params(args.quarantine), msg=f"Executing {len(tasks)} test suites...",
+               profile=args.profile)
+    success("Tests completed successfully.")
+    if args.quarantine == "retry":
+        retry_quarantined(tasks)
+
+def read_module_graph(root):
+    settings = (root / "settings.gradle.kts").read_text()
+    modules = re.findall(r'include\(\s*"(:[^"]+)"\s*\)', settings)
+    graph = {}
+    for m in modules:
+        module_dir = m[1:].replace(":", "/")
+        build_file = root / module_dir / "build.gradle.kts"
+        text = build_file.read_text() if build_file.exists() else ""
+        deps = set(re.findall(r'project\(\s*"(:[^"]+)"\s*\)', text))
+        if "kotlin.multiplatform" in text:
+            test_task = "allTests"
+        elif "android.application" in text:
+            test_task = "testDebugUnitTest"
+        else:
+            test_task = "test"
+        graph[m] = {
+            "dir": module_dir,
+            "deps": sorted(deps & set(modules) - {m}),
+            "test_task": test_task,
+            "jvm": "kotlin.multiplatform" in text and "jvm()" in text,
+        }
+    return graph
+
+def module_for_path(graph, path):
+    # Longest directory prefix wins, so nested modules like :shared:core beat a hypothetical :shared
+    best = None
+    for m, info in graph.items():
+        prefix = info["dir"] + "/"
+        if path.startswith(prefix) and (best is None or len(prefix) > len(graph[best]["dir"]) + 1):
+            best = m
+    return best
+
+def module_dependents(graph, modules):
+    reverse = {m: set() for m in graph}
+    for m, info in graph.items():
+        for dep in info["deps"]:
+            reverse[dep].add(m)
+    seen = set(modules)
+    queue = list(modules)
+    while queue:
+        for dependent in reverse.get(queue.pop(), ()):
+            if dependent not in seen:
+                seen.add(dependent)
+                queue.append(dependent)
+    return seen
+
+def changed_files_since(base):
+    res = run_command(["git", "merge-base", "HEAD", base], capture_output=True)
+    if res.returncode != 0:
+        error(f"Could not find a merge-base with '{base}'.")
+    # Diffing against the merge-base (not base...HEAD) also picks up staged and unstaged edits
+    diff = run_command(["git", "diff", "--name-only", "-z", res.stdout.strip()], capture_output=True)
+    files = {f for f in diff.stdout.split("\0") if f}
+    files.update(c["path"] for c in get_git_snapshot(refresh=True)["changes"] if c["xy"] == "??")
+    return sorted(files)
+
+def affected_modules(graph, base):
+    files = changed_files_since(base)
+    if any(f == g or (g.endswith("/") and f.startswith(g)) for f in files for g in GLOBAL_BUILD_FILES):
+        log("Root build configuration changed; testing every module.")
+        changed = set(graph)
+    else:
+        changed = {m for m in (module_for_path(graph, f) for f in files) if m}
+    affected = module_dependents(graph, changed)
+
+    log(f"{len(files)} changed file(s) against {base}, {len(affected)} affected module(s):")
+    for m in sorted(affected):
+        reason = "changed" if m in changed else "depends on a changed module"
+        print(f" {Colors.GRAY}•{Colors.NC} {Colors.BLUE}{m:16}{Colors.NC} {Colors.GRAY}{reason}{Colors.NC}")
+    return sorted(affected)
+
+def changed_test_tasks(base):
+    graph = read_module_graph(get_project_root())
+    return [f"{m}:{graph[m]['test_task']}" for m in affected_modules(graph, base)]
+
+# --- Test Sharding ---
+
+SHARD_INIT_SCRIPT = """// Generated by mm.py: gives each `mm test --shards` process its own build directory
+val mmShard = gradle.startParameter.projectProperties["mmShard"]
+if (mmShard != null) {
+    gradle.beforeProject {
+        layout.buildDirectory.set(layout.projectDirectory.dir("build/mm-shards/$mmShard"))
+    }
+}
+"""
+
+def find_test_classes(root, module_dir, source_sets=("commonTest", "jvmTest")):
+    classes = []
+    for source_set in source_sets:
+        src = root / module_dir / "src" / source_set / "kotlin"
+        if not src.is_dir():
+            continue
+        for path in iter_source_files(src):
+            if path.stem.endswith("Test"):
+                package = read_kotlin_package(path)
+                classes.append(f"{package}.{path.stem}" if package else path.stem)
+    return sorted(set(classes))
+
+def plan_shards(items, durations, count):
+    import heapq
+    known = sorted(durations.values())
+    default = known[len(known) // 2] if known else 1.0
+    weighted = sorted(((durations.get(cls, default), module, cls) for module, cls in items), reverse=True)
+    # Longest-processing-time first: always hand the next heaviest class to the lightest shard
+    heap = [(0.0, i) for i in range(count)]
+    shards = [{"items": [], "estimate": 0.0} for _ in range(count)]
+    for weight, module, cls in weighted:
+        load, i = heapq.heappop(heap)
+        shards[i]["items"].append((module, cls))
+        shards[i]["estimate"] = load + weight
+        heapq.heappush(heap, (load + weight, i))
+    return [s for s in shards if s["items"]]
+
+def merge_junit_reports(xml_files, dest):
+    import xml.etree.ElementTree as ET
+    merged = ET.Element("testsuites")
+    totals = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0}
+    elapsed = 0.0
+    durations = {}
+    for path in xml_files:
+        suite = ET.parse(path).getroot()
+        for key in totals:
+            totals[key] += int(suite.get(key, 0))
+        suite_time = float(suite.get("time", 0))
+        elapsed += suite_time
+        durations[suite.get("name")] = suite_time
+        merged.append(suite)
+    for key, value in totals.items():
+        merged.set(key, str(value))
+    merged.set("time", f"{elapsed:.3f}")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(merged).write(dest, encoding="utf-8", xml_declaration=True)
+    return totals, durations
+
+def run_sharded_tests(graph, modules, count, params=()):
+    import shutil
+    import subprocess
+    root = get_project_root()
+    jvm_modules = [m for m in modules if graph[m]["jvm"]]
+    items = [(m, cls) for m in jvm_modules for cls in find_test_classes(root, graph[m]["dir"])]
+    if not items:
+        success("No JVM test classes to run.")
+        return
+
+    durations_path = get_state_dir() / "test-durations.json"
+    durations = load_json(durations_path, {})
+    shards = plan_shards(items, durations, count)
+    log(f"Splitting {len(items)} test classes from {len(jvm_modules)} module(s) into {len(shards)} shard(s)...")
+
+    # Compile once in the main build so every shard can pull the outputs from the build cache
+    run_gradle([f"{m}:jvmTestClasses" for m in jvm_modules], msg="Compiling test classes...")
+
+    init_script = get_state_dir() / "shard-init.gradle.kts"
+    if not init_script.exists() or init_script.read_text() != SHARD_INIT_SCRIPT:
+        init_script.write_text(SHARD_INIT_SCRIPT)
+    log_dir = root / "build" / "mm-shards"
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    procs = []
+    for i, shard in enumerate(shards):
+        for m in jvm_modules:
+            shutil.rmtree(root / graph[m]["dir"] / "build" / "mm-shards" / str(i) / "test-results", ignore_errors=True)
+        cmd = ["./gradlew"] + gradle_init_args(root) + list(params) + ["--continue", "-I", str(init_script), f"-PmmShard={i}",
+               "--project-cache-dir", str(root / ".gradle" / f"mm-shard-{i}")]
+        by_module = {}
+        for module, cls in shard["items"]:
+            by_module.setdefault(module, []).append(cls)
+        for module, classes in by_module.items():
+            cmd.append(f"{module}:jvmTest")
+            for cls in classes:
+                cmd.extend(["--tests", cls])
+        log_file = open(log_dir / f"shard-{i}.log", "w")
+        procs.append((subprocess.Popen(cmd, cwd=root, stdout=log_file, stderr=subprocess.STDOUT), log_file,
+                      time.perf_counter(), cmd))
+
+    results = []
+    with Spinner(f"Running {len(procs)} shards in parallel..."):
+        for i, (proc, log_file, started, cmd) in enumerate(procs):
+            code = proc.wait()
+            log_file.close()
+            ended = time.perf_counter()
+            TRACER.record(f"shard {i}", "gradle", started, ended, {"argv": cmd, "exit_code": code})
+            results.append((code, ended - started))
+
+    xml_files = []
+    for i in range(len(shards)):
+        for m in jvm_modules:
+            results_dir = root / graph[m]["dir"] / "build" / "mm-shards" / str(i) / "test-results" / "jvmTest"
+            xml_files.extend(sorted(results_dir.glob("TEST-*.xml")))
+    merged_path = root / "build" / "test-results" / "mm-shards" / "TEST-merged.xml"
+    totals, measured = merge_junit_reports(xml_files, merged_path)
+    durations.update(measured)
+    save_json(durations_path, durations)
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- TEST SHARDS ---{Colors.NC}")
+    for i, (shard, (code, wall)) in enumerate(zip(shards, results)):
+        status = f"{Colors.GREEN}passed{Colors.NC}" if code == 0 else f"{Colors.RED}failed{Colors.NC}"
+        print(f" shard {i}: {len(shard['items']):3} classes  est {shard['estimate']:6.1f}s  "
+              f"wall {wall:6.1f}s  {status} {Colors.GRAY}{log_dir / f'shard-{i}.log'}{Colors.NC}")
+    print(f" {Colors.BOLD}Total:{Colors.NC} {totals['tests']} tests, {totals['failures']} failures, "
+          f"{totals['errors']} errors, {totals['skipped']} skipped")
+    log(f"Merged report: {merged_path}")
+    if any(code != 0 for code, _ in results):
+        error("One or more shards failed.")
+    success("Tests completed successfully.")
+
+# --- Test Reports ---
+
+def find_junit_reports(root):
+    for info in read_module_graph(root).values():
+        build = root / info["dir"] / "build"
+        # Gradle writes build/test-results/<task>/TEST-<class>.xml; `mm test --shards` nests the same layout per shard
+        yield from build.glob("test-results/*/TEST-*.xml")
+        yield from build.glob("mm-shards/*/test-results/*/TEST-*.xml")
+
+def iter_junit_cases(path):
+    # Clearing every finished testcase (and its captured output) off the root keeps memory flat per file
+    import xml.etree.ElementTree as ET
+    root = None
+    outcome = "passed"
+    try:
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                elif elem.tag == "testcase":
+                    outcome = "passed"
+                continue
+            if elem.tag in ("failure", "error"):
+                outcome = "failed"
+            elif elem.tag == "skipped" and outcome != "failed":
+                outcome = "skipped"
+            elif elem.tag == "testcase":
+                yield elem.get("classname") or "", elem.get("name") or "", float(elem.get("time") or 0), outcome
+                root.clear()
+    except (ET.ParseError, OSError, ValueError):
+        warn(f"Skipping unreadable test report: {path}")
+
+def count_flips(outcomes):
+    ran = [o for o in outcomes if o != "skipped"]
+    return sum(1 for a, b in zip(ran, ran[1:]) if a != b)
+
+def is_flaky(runs):
+    by_commit = {}
+    for commit, outcome, _ in runs:
+        if outcome != "skipped":
+            by_commit.setdefault(commit, set()).add(outcome)
+    # Passing and failing on the same commit is conclusive; across commits a failure may be a real regression that
+    # got fixed, so only repeated flipping counts
+    return any(len(o) > 1 for o in by_commit.values()) or count_flips([r[1] for r in runs]) >= FLAKY_MIN_FLIPS
+
+def ingest_test_results(root):
+    import statistics
+    history_path = get_state_dir() / "test-history.json"
+    history = load_json(history_path, {"files": {}, "tests": {}})
+    commit = get_head_sha() or "unknown"
+    current = {}
+    classes = {}
+    new_files = 0
+    for path in find_junit_reports(root):
+        rel = str(path.relative_to(root))
+        mtime = path.stat().st_mtime
+        fresh = history["files"].get(rel) != mtime
+        new_files += fresh
+        task = path.parent.name
+        for cls, name, duration, outcome in iter_junit_cases(path):
+            test_id = f"{cls}#{name}"
+            current[(task, test_id)] = (duration, outcome)
+            classes[(task, cls)] = classes.get((task, cls), 0.0) + duration
+            if fresh:
+                runs = history["tests"].setdefault(test_id, [])
+                runs.append([commit, outcome, duration])
+                del runs[:-TEST_HISTORY_RUNS]
+        history["files"][rel] = mtime
+    save_json(history_path, history)
+
+    slowdowns = []
+    for (task, test_id), (duration, outcome) in current.items():
+        past = [r[2] for r in history["tests"].get(test_id, [])[:-1] if r[1] == "passed"]
+        if outcome == "passed" and len(past) >= 3:
+            median = statistics.median(past)
+            if duration > median * TEST_SLOWDOWN_FACTOR and duration - median >= TEST_SLOWDOWN_MIN_SECONDS:
+                slowdowns.append((duration, median, task, test_id))
+    return {"current": current, "classes": classes, "history": history["tests"], "new_files": new_files,
+            "slowdowns": sorted(slowdowns, reverse=True)}
+
+def load_quarantine():
+    return load_json(get_state_dir() / "test-quarantine.json", {})
+
+def kotlin_string(value):
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("$", "\\$") + '"'
+
+def quarantine_init_script(quarantine, include):
+    lines = []
+    for test_id in sorted(quarantine):
+        cls, _, name = test_id.partition("#")
+        lines.append(f"            {'includeTest' if include else 'excludeTest'}({kotlin_string(cls)}, {kotlin_string(name)})")
+    # A retry run only selects quarantined tests, so tasks that contain none of them must not fail the build
+    no_match = "            isFailOnNoMatchingTests = false\n" if include else ""
+    return ("// Generated by mm.py from .mm/test-quarantine.json (`mm test report --quarantine-flaky`)\n"
+            "gradle.beforeProject {\n"
+            "    tasks.withType(Test::class.java).configureEach {\n"
+            "        filter {\n" + no_match + "\n".join(lines) + "\n"
+            "        }\n"
+            "    }\n"
+            "}\n")
+
+def quarantine_params(mode, include=False):
+    quarantine = load_quarantine()
+    if mode == "include" or not quarantine:
+        return []
+    path = get_state_dir() / ("quarantine-retry.gradle.kts" if include else "quarantine-exclude.gradle.kts")
+    script = quarantine_init_script(quarantine, include)
+    if not path.exists() or path.read_text() != script:
+        path.write_text(script)
+    return ["-I", str(path)]
+
+def retry_quarantined(tasks):
+    quarantine = load_quarantine()
+    if not quarantine:
+        return
+    # The retry run rewrites the test-results directories, so record the main run before it is overwritten
+    ingest_test_results(get_project_root())
+    params = quarantine_params("retry", include=True)
+    for attempt in range(1, QUARANTINE_RETRIES + 1):
+        res = run_gradle(tasks, params, capture_output=True,
+                         msg=f"Running {len(quarantine)} quarantined test(s) (attempt {attempt})...")
+        if res.returncode == 0:
+            success(f"Quarantined tests passed on attempt {attempt}.")
+            return
+    warn(f"Quarantined tests still fail after {QUARANTINE_RETRIES} attempts (not failing the build); "
+         f"see 'mm test report'.")
+
+def handle_test_report(args):
+    root = get_project_root()
+    with Spinner("Reading test results..."):
+        report = ingest_test_results(root)
+    current = report["current"]
+    if not current:
+        error("No test results found. Run 'mm test' first.")
+    quarantine = load_quarantine()
+    outcomes = [outcome for _, outcome in current.values()]
+    wall = sum(duration for duration, _ in current.values())
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- TEST REPORT ---{Colors.NC}")
+    print(f" {len(current)} tests: {Colors.GREEN}{outcomes.count('passed')} passed{Colors.NC}, "
+          f"{Colors.RED}{outcomes.count('failed')} failed{Colors.NC}, {outcomes.count('skipped')} skipped "
+          f"{Colors.GRAY}({wall:.1f}s of test time){Colors.NC}")
+    if not report["new_files"]:
+        print(f" {Colors.GRAY}No new results since the last report; history unchanged.{Colors.NC}")
+
+    print(f"\n{Colors.BOLD}Slowest tests:{Colors.NC}")
+    for (task, test_id), (duration, outcome) in sorted(current.items(), key=lambda kv: -kv[1][0])[:args.top]:
+        color = Colors.RED if outcome == "failed" else Colors.NC
+        print(f" {duration:8.2f}s {color}{test_id}{Colors.NC} {Colors.GRAY}{task}{Colors.NC}")
+    print(f"\n{Colors.BOLD}Slowest classes:{Colors.NC}")
+    for (task, cls), duration in sorted(report["classes"].items(), key=lambda kv: -kv[1])[:args.top]:
+        share = duration / wall * 100 if wall else 0
+        print(f" {duration:8.2f}s {cls} {Colors.GRAY}{task}, {share:.0f}% of test time{Colors.NC}")
+
+    if report["slowdowns"]:
+        print(f"\n{Colors.BOLD}Duration regressions:{Colors.NC}")
+        for duration, median, task, test_id in report["slowdowns"][:args.top]:
+            print(f" {duration:8.2f}s {test_id} {Colors.RED}was {median:.2f}s{Colors.NC} {Colors.GRAY}{task}{Colors.NC}")
+
+    ids = {test_id for _, test_id in current}
+    flaky = sorted(t for t in ids if is_flaky(report["history"].get(t, [])))
+    if flaky:
+        print(f"\n{Colors.BOLD}Flaky tests:{Colors.NC}")
+        for test_id in flaky:
+            runs = report["history"][test_id]
+            failed = sum(1 for r in runs if r[1] == "failed")
+            mark = f" {Colors.GRAY}(quarantined){Colors.NC}" if test_id in quarantine else ""
+            print(f" {Colors.YELLOW}{test_id}{Colors.NC} failed {failed}/{len(runs)} runs, "
+                  f"{count_flips([r[1] for r in runs])} flips{mark}")
+
+    changed = False
+    if args.quarantine_flaky:
+        for test_id in flaky:
+            if test_id not in quarantine:
+                quarantine[test_id] = {"since": get_head_sha() or "unknown", "recorded": time.time()}
+                changed = True
+    for test_id in args.release or []:
+        if quarantine.pop(test_id, None) is None:
+            warn(f"Not quarantined: {test_id}")
+        changed = True
+    if changed:
+        save_json(get_state_dir() / "test-quarantine.json", quarantine)
+    if quarantine:
+        print(f"\n{Colors.BOLD}Quarantine ({len(quarantine)}):{Colors.NC} {Colors.GRAY}excluded from 'mm test', "
+              f"use --quarantine retry|include to run them{Colors.NC}")
+        for test_id in sorted(quarantine):
+            print(f" {Colors.GRAY}•{Colors.NC} {test_id}")
+    elif flaky and not args.quarantine_flaky:
+        log("Run 'mm test report --quarantine-flaky' to exclude the flaky tests from 'mm test'.")
+
+@traced
+def handle_task(args):
+    sub = args.subcommand
+    if sub == "new":
+        task_type = args.type
+        name = validate_task_name(args.name)
+        branch = f"{task_type}/{name}"
+        target_dir = safe_path_join(get_worktrees_dir(), name)
+        
+        if target_dir.exists():
+            error(f"Worktree directory already exists: {target_dir}")
+        
+        log(f"Creating worktree for '{branch}'...")
+        get_worktrees_dir().mkdir(exist_ok=True)
+        run_command(["git", "worktree", "add", str(target_dir), "-b", branch])
+        
+        copy_config_files(target_dir)
+        cache_script = get_project_root() / STATE_DIR / "init.d" / BUILD_CACHE_INIT_SCRIPT
+        if cache_script.exists():
+            wire_build_cache(target_dir, cache_script.read_text())
+            log("Wired worktree to the shared build cache.")
+        if args.warm:
+            pid = start_warm_worker(target_dir, get_project_root())
+            log(f"Warming in the background (pid {pid}); follow it with 'mm status'.")
+        
+        success(f"Worktree ready: {target_dir}")
+        print(f"Tip: cd {target_dir}")
+        
+    elif sub == "list":
+        run_command(["git", "worktree", "list"])
+
+    elif sub == "locate":
+        name = args.name
+        path = next((p for p in list_worktree_paths() if p.endswith(f"/{name}")), None)
+        if path:
+            print(path)
+        else:
+            error(f"Workspace '{name}' not found.")
+
+    elif sub == "warm":
+        name = validate_task_name(args.name)
+        target_dir = safe_path_join(get_worktrees_dir(), name)
+        if not target_dir.is_dir():
+            error(f"Workspace '{name}' not found.")
+        source = Path(args.source) if args.source else Path(get_git_snapshot()["worktrees"][0]["path"])
+        if not args.foreground:
+            pid = start_warm_worker(target_dir, source)
+            success(f"Warming '{name}' in the background (pid {pid}); follow it with 'mm status'.")
+            return
+        if not warm_worktree(target_dir, source):
+            sys.exit(1)
+
+    elif sub == "clean":
+        log("Pruning orphaned worktree metadata...")
+        run_command(["git", "worktree", "prune"])
+        success("Cleanup complete.")
+        
+    elif sub == "remove":
+        if args.merged:
+            remove_merged_worktrees(args)
+            return
+        name = args.name
+        if not name:
+            res = run_command(["git", "worktree", "list", "--porcelain"], capture_output=True)
+            worktrees = []
+            for line in res.stdout.splitlines():
+                if line.startswith("worktree"):
+                    path = Path(line.split()[1])
+                    if path != get_project_root():
+                        worktrees.append(path.name)
+            
+            if not worktrees:
+                log("No additional worktrees found.")
+                return
+                
+            print(f"\n{Colors.BOLD}Select worktree to remove:{Colors.NC}")
+            for i, wt in enumerate(worktrees):
+                print(f"  {i+1}) {wt}")
+            
+            try:
+                choice = input(f"\nSelection (1-{len(worktrees)}, or 'c' to cancel): ")
+                if choice.lower() == 'c': return
+                idx = int(choice) - 1
+                name = worktrees[idx]
+            except (ValueError, IndexError):
+                error("Invalid selection.")
+
+        validate_task_name(name)
+        target_dir = safe_path_join(get_worktrees_dir(), name)
+        if str(target_dir) in os.getcwd():
+            error("Cannot remove the current worktree.")
+        # Resolve the branch before the worktree disappears from `git worktree list`
+        wt = next((wt for wt in get_git_snapshot(refresh=True)["worktrees"] if Path(wt["path"]) == target_dir), None)
+        if wt and wt["branch"]:
+            branches = [wt["branch"]]
+        else:
+            refs = [f"refs/heads/{t}/{name}" for t in TASK_TYPES]
+            res = run_command(["git", "for-each-ref", "--format=%(refname:short)"] + refs, capture_output=True)
+            branches = res.stdout.split()
+        
+        log(f"Removing worktree {name}...")
+        if stop_warm_worker(target_dir):
+            log("Stopped the background warm-up job.")
+        if target_dir.exists():
+            run_command(["git", "worktree", "remove", str(target_dir), "--force"])
+        else:
+            # Try removing by name if dir is gone
+            run_command(["git", "worktree", "prune"])
+        
+        if branches:
+            run_command(["git", "branch", "-D"] + branches)
+        success(f"Worktree '{name}' and associated branches removed.")
+
+def branch_has_commits(commondir, branch):
+    # The branch reflog starts with its creation; any later entry that moved the tip means a commit, merge or reset
+    # happened on it. Without a reflog there is no way to tell, so the branch is assumed to have history.
+    reflog = commondir / "logs" / "refs" / "heads" / branch if commondir else None
+    try:
+        with open(reflog, "r") as f:
+            tips = {line.split(" ", 2)[1] for line in f if line.strip()}
+    except (OSError, TypeError, IndexError):
+        return True
+    return len(tips) != 1
+
+def remove_merged_worktrees(args):
+    from concurrent.futures import ThreadPoolExecutor
+    res = run_command(["git", "for-each-ref", "--format=%(refname:short) %(objectname)", "--merged", args.base,
+                       "refs/heads"], capture_output=True)
+    base_sha = run_command(["git", "rev-parse", "--verify", "-q", f"{args.base}^{{commit}}"], capture_output=True)
+    if res.returncode != 0 or base_sha.returncode != 0:
+        error(f"Unknown base branch '{args.base}'.")
+    # A branch with no commits of its own (a fresh `mm task new`) is an ancestor of the base too, so --merged alone
+    # would sweep up work that hasn't started yet
+    commondir = (find_git_dirs() or (None, None, None))[2]
+    merged = {branch for branch, sha in (line.split() for line in res.stdout.splitlines())
+              if branch != args.base and sha != base_sha.stdout.strip() and branch_has_commits(commondir, branch)}
+    worktrees = get_git_snapshot(refresh=True)["worktrees"]
+    cwd = Path(os.getcwd()).resolve()
+    # The first entry is always the main worktree, which is never a candidate
+    candidates = [wt for wt in worktrees[1:] if wt["branch"] in merged
+                  and not (cwd == Path(wt["path"]) or Path(wt["path"]) in cwd.parents)]
+    if not candidates:
+        log(f"No worktrees with branches merged into {args.base}.")
+        return
+
+    print(f"\n{Colors.BOLD}Worktrees merged into {args.base}:{Colors.NC}")
+    for wt in candidates:
+        print(f"  {Colors.BLUE}{wt['path']:40}{Colors.NC} {Colors.PURPLE}[{wt['branch']}]{Colors.NC}")
+    if args.dry_run:
+        return
+    if not args.yes:
+        choice = input(f"\nRemove {len(candidates)} worktree(s) and their branches? [y/N] ")
+        if choice.strip().lower() != "y":
+            return
+
+    def remove(wt):
+        path = Path(wt["path"])
+        stop_warm_worker(path)
+        if not path.exists():
+            return True, ""
+        # No --force: a worktree with uncommitted work is left for the user to look at
+        res = run_command(["git", "worktree", "remove", str(path)], capture_output=True)
+        return res.returncode == 0, (res.stderr or "").strip()
+
+    with ThreadPoolExecutor(max_workers=min(8, len(candidates))) as pool:
+        results = list(pool.map(remove, candidates))
+    run_command(["git", "worktree", "prune"])
+
+    removed = []
+    for wt, (ok, err) in zip(candidates, results):
+        if ok:
+            removed.append(wt["branch"])
+        else:
+            warn(f"Kept {wt['path']}: {err.splitlines()[-1] if err else 'git worktree remove failed'}")
+    if removed:
+        run_command(["git", "branch", "-D"] + removed)
+    success(f"Removed {len(removed)} of {len(candidates)} merged worktree(s).")
+
+def read_kover_totals(root):
+    path = root / KOVER_XML_REPORT
+    report = parse_kover_report(path) if path.exists() else None
+    if not report:
+        return None
+    return {kind: dict(c, pct=coverage_pct(c["covered"], c["missed"])) for kind, c in report["totals"].items()}
+
+def parse_numstat(raw):
+    stats = {}
+    records = raw.split("\0")
+    i = 0
+    while i < len(records):
+        rec = records[i]
+        i += 1
+        if not rec:
+            continue
+        added, deleted, path = rec.split("\t", 2)
+        if not path:
+            # Renames put the old and new paths in the next two NUL-separated records
+            path = records[i + 1]
+            i += 2
+        stats[path] = {"added": None if added == "-" else int(added), "deleted": None if deleted == "-" else int(deleted)}
+    return stats
+
+def stream_diff_hunks(lines, max_chars):
+    # Yields one dict per hunk, with its text capped at max_chars while still counting every changed line.
+    # Hunk line counts from the @@ header tell body lines apart from the next file's ---/+++ headers.
+    path = old_path = None
+    hunk = None
+    old_left = new_left = 0
+    for line in lines:
+        line = line.rstrip("\n")
+        if hunk is not None and (old_left > 0 or new_left > 0):
+            tag = line[:1]
+            if tag == "\\":
+                continue
+            if tag in ("-", " "):
+                old_left -= 1
+            if tag in ("+", " "):
+                new_left -= 1
+            if tag in ("+", "-"):
+                hunk["changed"] += 1
+            if not hunk["truncated"] and hunk["chars"] + len(line) + 1 <= max_chars:
+                hunk["lines"].append(line)
+                hunk["chars"] += len(line) + 1
+            else:
+                hunk["truncated"] = True
+            continue
+        if hunk is not None:
+            yield hunk
+            hunk = None
+        if line.startswith("--- "):
+            old_path = line[6:] if line.startswith("--- a/") else None
+        elif line.startswith("+++ "):
+            path = line[6:] if line.startswith("+++ b/") else old_path
+        elif line.startswith("@@ ") and path:
+            m = re.match(r"@@ -\d+(?:,(\d+))? \+\d+(?:,(\d+))? @@", line)
+            if not m:
+                continue
+            old_left = int(m.group(1) or 1)
+            new_left = int(m.group(2) or 1)
+            hunk = {"path": path, "header": line, "changed": 0, "lines": [], "chars": len(line) + 1, "truncated": False}
+    if hunk is not None:
+        yield hunk
+
+def untracked_file_hunk(root, path, max_chars):
+    # Untracked files have no diff; present them as a single all-added hunk read in bounded chunks
+    hunk = {"path": path, "header": "", "changed": 0, "lines": [], "chars": 0, "truncated": False}
+    try:
+        with open(root / path, "rb") as f:
+            if b"\0" in f.read(8192):
+                return None
+            f.seek(0)
+            for raw in f:
+                line = "+" + raw.decode("utf-8", "replace").rstrip("\n")
+                hunk["changed"] += 1
+                if not hunk["truncated"] and hunk["chars"] + len(line) + 1 <= max_chars:
+                    hunk["lines"].append(line)
+                    hunk["chars"] += len(line) + 1
+                else:
+                    hunk["truncated"] = True
+    except OSError:
+        return None
+    hunk["header"] = f"@@ -0,0 +1,{hunk['changed']} @@"
+    hunk["chars"] += len(hunk["header"]) + 1
+    return hunk
+
+def collect_diff_excerpts(root, untracked, budget_chars):
+    # Keeps only the most-changed hunks that fit the budget: a min-heap on changed lines is trimmed as hunks
+    # stream in, so memory stays around the budget however large the diff is.
+    import heapq
+    import subprocess
+    heap = []
+    used = 0
+    omitted = {}
+    untracked_lines = {}
+
+    def offer(seq, hunk):
+        nonlocal used
+        heapq.heappush(heap, (hunk["changed"], -seq, hunk))
+        used += hunk["chars"]
+        while used > budget_chars and heap:
+            _, _, dropped = heapq.heappop(heap)
+            used -= dropped["chars"]
+            omitted[dropped["path"]] = omitted.get(dropped["path"], 0) + 1
+
+    proc = subprocess.Popen(["git", "-c", "core.quotepath=off", "diff", "--no-color", "--no-ext-diff", "HEAD"],
+                            cwd=root, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, errors="replace")
+    seq = 0
+    with proc.stdout:
+        for seq, hunk in enumerate(stream_diff_hunks(proc.stdout, budget_chars)):
+            offer(seq, hunk)
+    proc.wait()
+    for path in untracked:
+        hunk = untracked_file_hunk(root, path, budget_chars)
+        if hunk:
+            untracked_lines[path] = hunk["changed"]
+            seq += 1
+            offer(seq, hunk)
+
+    kept = {}
+    for changed, _, hunk in sorted(heap, key=lambda h: (-h[0], -h[1])):
+        kept.setdefault(hunk["path"], []).append({"header": hunk["header"], "changed": changed,
+                                                   "text": "\n".join(hunk["lines"]), "truncated": hunk["truncated"]})
+    return kept, omitted, used, untracked_lines
+
+def print_context_json(args):
+    import json
+    root = get_project_root()
+    snapshot = get_git_snapshot(refresh=args.refresh)
+    budget = args.budget if args.budget is not None else CONTEXT_BUDGET_TOKENS
+    numstat = parse_numstat(run_command(["git", "-c", "core.quotepath=off", "diff", "--numstat", "-z", "HEAD"],
+                                        cwd=root, capture_output=True).stdout or "")
+    untracked = [c["path"] for c in snapshot["changes"] if c["xy"] == "??" and not c["path"].endswith("/")]
+    excerpts, omitted, used, untracked_lines = collect_diff_excerpts(root, untracked, budget * CONTEXT_CHARS_PER_TOKEN)
+
+    graph = read_module_graph(root)
+    files = []
+    for change in snapshot["changes"]:
+        path = change["path"]
+        stat = numstat.get(path, {"added": None, "deleted": None})
+        if path in untracked_lines:
+            stat = {"added": untracked_lines[path], "deleted": 0}
+        files.append({"path": path, "status": change["xy"].strip(), "orig_path": change["orig"],
+                      "module": module_for_path(graph, path), **stat,
+                      "hunks": excerpts.get(path, []), "omitted_hunks": omitted.get(path, 0)})
+    files.sort(key=lambda f: -((f["added"] or 0) + (f["deleted"] or 0)))
+
+    changed = {f["module"] for f in files if f["module"]}
+    modules = [{"module": m, "label": MODULE_LABELS.get(m, ("MODULE", m))[1],
+                "reason": "changed" if m in changed else "depends on a changed module"}
+               for m in sorted(module_dependents(graph, changed))]
+    if any(f["path"] in CLI_FILES for f in files):
+        modules.append({"module": "mm.py", "label": "CLI Manager", "reason": "changed"})
+
+    totals = read_kover_totals(root)
+    coverage = None
+    if totals:
+        coverage = {kind.lower(): {"covered": c["covered"], "missed": c["missed"], "pct": round(c["pct"], 2)}
+                    for kind, c in totals.items()}
+        coverage["report"] = KOVER_XML_REPORT
+    print(json.dumps({
+        "branch": snapshot["branch"],
+        "head": snapshot["oid"],
+        "upstream": snapshot["upstream"],
+        "ahead": snapshot["ahead"],
+        "behind": snapshot["behind"],
+        "recent_commits": [{"sha": sha, "message": msg} for sha, msg in snapshot["log"]],
+        "files": files,
+        "modules": modules,
+        "coverage": coverage,
+        "budget": {"tokens": budget, "chars_used": used, "truncated": bool(omitted) or
+                   any(h["truncated"] for f in files for h in f["hunks"])},
+    }, indent=2))
+
+@traced
+def handle_sync(args):
+    from concurrent.futures import ThreadPoolExecutor
+    log("Syncing config files...")
+    root = get_project_root()
+    targets = [Path(wt["path"]) for wt in get_git_snapshot()["worktrees"] if Path(wt["path"]) != root]
+    missing = [t for t in targets if not t.is_dir()]
+    targets = [t for t in targets if t.is_dir()]
+    for t in missing:
+        warn(f"Skipping {t.name}: directory is gone (run 'mm task clean')")
+    if not targets:
+        log("No additional worktrees found.")
+        return
+
+    sources = config_file_sources()
+    manifest_path = get_state_dir() / "sync-manifest.json"
+    manifest = load_json(manifest_path, {})
+    with ThreadPoolExecutor(max_workers=min(8, len(targets))) as pool:
+        results = list(pool.map(lambda t: sync_config_files(t, sources, manifest.get(str(t))), targets))
+
+    # Entries for removed worktrees are dropped so the manifest does not grow forever
+    save_json(manifest_path, {str(t): entries for t, (_, _, entries) in zip(targets, results)})
+    total = 0
+    for t, (copied, skipped, _) in zip(targets, results):
+        total += len(copied)
+        detail = f" {Colors.GRAY}({', '.join(copied)}){Colors.NC}" if copied else ""
+        color = Colors.YELLOW if copied else Colors.GRAY
+        print(f" {Colors.BLUE}{t.name:30}{Colors.NC} {color}{len(copied)} copied{Colors.NC}, {len(skipped)} unchanged{detail}")
+    success(f"All worktrees synchronized ({total} file(s) updated).")
+
+@traced
+def handle_context(args):
+    if args.json:
+        print_context_json(args)
+        return
+    log("Generating AI Context Summary...")
+    snapshot = get_git_snapshot(refresh=args.refresh)
+    changes = snapshot["changes"]
+    modified_files = [c["path"] for c in changes]
+    
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- AI CONTEXT SUMMARY ---{Colors.NC}")
+    print(f"{Colors.BOLD}Current Branch:{Colors.NC} {Colors.PURPLE}{snapshot['branch']}{Colors.NC}")
+    print(f"{Colors.BOLD}Status:{Colors.NC} {Colors.YELLOW}{len(modified_files)}{Colors.NC} files modified/untracked")
+    
+    totals = read_kover_totals(get_project_root())
+    if totals and "LINE" in totals:
+        line = totals["LINE"]
+        print(f"{Colors.BOLD}Coverage:{Colors.NC} {Colors.GREEN}{line['pct']:.1f}% lines "
+              f"({line['covered']}/{line['covered'] + line['missed']}){Colors.NC}")
+    else:
+        # No local Kover run yet; fall back to the last published summary
+        report_path = get_project_root() / "docs/KOVER_COVERAGE_SUMMARY.md"
+        if report_path.exists():
+            with open(report_path, "r") as f:
+                for line in f:
+                    if "Mission Accomplished" in line or "Line Coverage" in line:
+                        coverage_text = line.strip().replace('#', '').strip()
+                        print(f"{Colors.BOLD}Coverage:{Colors.NC} {Colors.GREEN}{coverage_text}{Colors.NC}")
+                        break
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}Impacted Modules:{Colors.NC}")
+    graph = read_module_graph(get_project_root())
+    impacted = set()
+    for f in modified_files:
+        module = module_for_path(graph, f)
+        if module:
+            tag, desc = MODULE_LABELS.get(module, ("MODULE", module))
+            impacted.add(f"{Colors.BLUE}[{tag}]{Colors.NC} {desc}")
+        elif f in CLI_FILES:
+            impacted.add(f"{Colors.BLUE}[TOOLING]{Colors.NC} CLI Manager")
+    
+    for label in sorted(impacted):
+        print(f" {Colors.GRAY}•{Colors.NC} {label}")
+            
+    print(f"\n{Colors.CYAN}{Colors.BOLD}Recent Changes:{Colors.NC}")
+    if changes:
+        print_git_changes(changes)
+    else:
+        print(f" {Colors.GRAY}No uncommitted changes.{Colors.NC}")
+    
+    print(f"\n{Colors.CYAN}{Colors.BOLD}Recent History (Last 3 Commits):{Colors.NC}")
+    for sha, msg in snapshot["log"]:
+        print(f" {Colors.YELLOW}{sha}{Colors.NC} {msg}")
+    print(f"{Colors.CYAN}--------------------------{Colors.NC}\n")
+
+@traced
+def handle_done(args):
+    log("Finalizing task...")
+    log("Running verification...")
+    run_gradle(["spotlessApply", "detekt"], msg="Verifying and formatting...")
+    
+    branch_res = run_command(["git", "rev-parse", "--abbrev-ref", "HEAD"], capture_output=True)
+    branch = branch_res.stdout.strip()
+    print(f"\n{Colors.BOLD}Final Status:{Colors.NC}")
+    run_command(["git", "status", "--short"])
+    
+    if "/" in branch:
+        task_type, desc = branch.split("/", 1)
+        desc = desc.replace("-", " ")
+        success(f"Suggested command: git commit -m \"{task_type}: {desc}\"")
+    else:
+        success("Suggested command: git commit -m \"feat: description\"")
+
+def version_line(output):
+    for line in output.splitlines():
+        line = line.strip()
+        if line and not line.startswith("-") and not line.startswith("("):
+            return line
+    return "Unknown"
+
+def binary_cache_key(binary, *extra):
+    # A tool's version can only change when the file behind it does, so its resolved path + mtime stand in for it
+    import shutil
+    found = shutil.which(binary)
+    if not found:
+        return None
+    parts = []
+    for path in (found, *extra):
+        real = os.path.realpath(path)
+        try:
+            parts.append(f"{real}@{os.stat(real).st_mtime_ns}")
+        except OSError:
+            parts.append(real)
+    return "|".join(parts)
+
+def run_version_check(name, cmd, key, timeout, cache):
+    import subprocess
+    if not key:
+        return {"name": name, "status": "fail", "detail": "Not found"}
+    cached = cache.get(name)
+    if cached and cached["key"] == key:
+        return {"name": name, "status": "ok", "detail": cached["version"], "cached": True}
+    try:
+        res = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, stdin=subprocess.DEVNULL)
+    except subprocess.TimeoutExpired:
+        return {"name": name, "status": "warn", "detail": f"Timed out after {timeout:.0f}s"}
+    except OSError as e:
+        return {"name": name, "status": "warn", "detail": f"Found but could not run: {e.strerror}"}
+    if res.returncode != 0:
+        return {"name": name, "status": "warn", "detail": "Found but could not get version"}
+    version = version_line(res.stdout or res.stderr)
+    cache[name] = {"key": key, "version": version}
+    return {"name": name, "status": "ok", "detail": version}
+
+def read_properties(path):
+    props = {}
+    try:
+        lines = Path(path).read_text().splitlines()
+    except OSError:
+        return props
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith(("#", "!")) and "=" in line:
+            key, _, value = line.partition("=")
+            props[key.strip()] = value.strip()
+    return props
+
+def parse_xmx_bytes(jvmargs):
+    m = re.search(r"-Xmx(\d+)([kKmMgG]?)", jvmargs or "")
+    if not m:
+        return None
+    return int(m.group(1)) * {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}[m.group(2).lower()]
+
+def read_memory_bytes():
+    # (total, available); available is None where the OS offers no cheap way to read it
+    if sys.platform == "darwin":
+        res = run_command(["sysctl", "-n", "hw.memsize"], capture_output=True)
+        return (int(res.stdout), None) if res.returncode == 0 else (None, None)
+    info = {}
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                info[key] = int(value.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None, None
+    return info.get("MemTotal"), info.get("MemAvailable")
+
+def check_memory(root):
+    props = read_properties(root / "gradle.properties")
+    heaps = [(label, parse_xmx_bytes(props.get(key))) for label, key in
+             [("Gradle", "org.gradle.jvmargs"), ("Kotlin daemon", "kotlin.daemon.jvmargs")]]
+    heaps = [(label, size) for label, size in heaps if size]
+    total, available = read_memory_bytes()
+    if not total:
+        return {"name": "Memory", "status": "warn", "detail": "Could not read system memory"}
+    gib = 1024 ** 3
+    wanted = sum(size for _, size in heaps)
+    detail = (f"{' + '.join(f'{label} -Xmx{size / gib:.0f}G' for label, size in heaps) or 'no -Xmx set'} vs "
+              f"{total / gib:.1f} GiB RAM" + (f" ({available / gib:.1f} GiB available)" if available else ""))
+    if wanted > total:
+        return {"name": "Memory", "status": "fail", "detail": detail + "; heaps exceed physical RAM, builds will swap"}
+    if available and wanted > available:
+        return {"name": "Memory", "status": "warn", "detail": detail + "; close other apps or lower -Xmx"}
+    return {"name": "Memory", "status": "ok", "detail": detail}
+
+def check_gradle_daemons(root, timeout):
+    import subprocess
+    # Daemons are found in the process table rather than with `./gradlew --status`, which starts a JVM of its own
+    # on every doctor run. A daemon's command line ends in its Gradle version, and only daemons of the wrapper's
+    # version can take this project's builds.
+    try:
+        res = subprocess.run(["ps", "-A", "-ww", "-o", "command="], capture_output=True, text=True, timeout=timeout,
+                             stdin=subprocess.DEVNULL)
+    except subprocess.TimeoutExpired:
+        return {"name": "Daemon", "status": "warn", "detail": f"ps timed out after {timeout:.0f}s"}
+    except OSError:
+        return {"name": "Daemon", "status": "warn", "detail": "ps not found; cannot list Gradle daemons"}
+    if res.returncode != 0:
+        detail = (res.stderr or "").strip().splitlines()
+        return {"name": "Daemon", "status": "warn", "detail": f"ps failed: {detail[-1] if detail else res.returncode}"}
+    daemons = re.findall(r"^(\S+) .*org\.gradle\.launcher\.daemon\.bootstrap\.GradleDaemon (\S+)", res.stdout,
+                         re.MULTILINE)
+    versions = [version for exe, version in daemons if os.path.basename(exe) == "java"]
+    props = read_properties(root / "gradle" / "wrapper" / "gradle-wrapper.properties")
+    m = re.search(r"gradle-(.+?)-(?:bin|all)\.zip", props.get("distributionUrl", ""))
+    wanted = m.group(1) if m else None
+    usable = [v for v in versions if wanted is None or v == wanted]
+    if not usable:
+        other = f" ({len(versions)} for other Gradle versions)" if versions else ""
+        return {"name": "Daemon", "status": "warn",
+                "detail": f"None running{' for Gradle ' + wanted if wanted else ''}{other}; "
+                          "the next build pays JVM startup and warm-up"}
+    return {"name": "Daemon", "status": "ok",
+            "detail": f"{len(usable)} running{' for Gradle ' + wanted if wanted else ''}"}
+
+def check_configuration_cache(root):
+    props = read_properties(root / "gradle.properties")
+    if props.get("org.gradle.configuration-cache") != "true":
+        return {"name": "Config cache", "status": "warn", "detail": "Disabled in gradle.properties"}
+    cache_dir = root / ".gradle" / "configuration-cache"
+    entries = [e for e in cache_dir.iterdir() if e.is_dir()] if cache_dir.is_dir() else []
+    if not entries:
+        return {"name": "Config cache", "status": "warn", "detail": "Enabled but empty; the next build configures from scratch"}
+    newest = max(e.stat().st_mtime for e in entries)
+    inputs = [root / name for name in ("settings.gradle.kts", "build.gradle.kts", "gradle.properties",
+                                       "gradle/libs.versions.toml")]
+    inputs += [root / m["dir"] / "build.gradle.kts" for m in read_module_graph(root).values()]
+    stale = [str(p.relative_to(root)) for p in inputs if p.exists() and p.stat().st_mtime > newest]
+    if stale:
+        return {"name": "Config cache", "status": "warn",
+                "detail": f"{len(entries)} entries, but {', '.join(stale[:3])}{' ...' if len(stale) > 3 else ''} "
+                          "changed since the last store; the next build reconfigures"}
+    return {"name": "Config cache", "status": "ok", "detail": f"{len(entries)} entries, newer than all build scripts"}
+
+@traced
+def handle_doctor(args):
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+    if not args.json:
+        log("Checking environment health...")
+    root = get_project_root()
+    cache_path = get_state_dir() / "doctor-cache.json"
+    cache = {} if args.refresh else load_json(cache_path, {})
+    wrapper_props = root / "gradle" / "wrapper" / "gradle-wrapper.properties"
+    checks = [
+        ("JDK", ["java", "-version"], binary_cache_key("java")),
+        ("Git", ["git", "--version"], binary_cache_key("git")),
+        ("ADB", [ADB, "version"], binary_cache_key(ADB)),
+        ("Gradle", ["./gradlew", "--version"], binary_cache_key(str(root / "gradlew"), wrapper_props)),
+    ]
+    if sys.platform == "darwin":
+        checks.append(("Xcode", ["xcodebuild", "-version"], binary_cache_key("xcodebuild")))
+
+    def timed(fn, *fn_args):
+        started = time.perf_counter()
+        result = fn(*fn_args)
+        result.setdefault("cached", False)
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    with ThreadPoolExecutor(max_workers=len(checks) + 3) as pool:
+        futures = [pool.submit(timed, run_version_check, name, cmd, key, args.timeout, cache)
+                   for name, cmd, key in checks]
+        futures += [pool.submit(timed, check_gradle_daemons, root, args.timeout),
+                    pool.submit(timed, check_memory, root),
+                    pool.submit(timed, check_configuration_cache, root)]
+        results = [f.result() for f in futures]
+    save_json(cache_path, cache)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    marks = {"ok": f"{Colors.GREEN}✓", "warn": f"{Colors.YELLOW}?", "fail": f"{Colors.RED}✗"}
+    for r in results:
+        timing = f" {Colors.GRAY}(cached){Colors.NC}" if r["cached"] else ""
+        print(f" {marks[r['status']]}{Colors.NC} {r['name']:12} : {r['detail']}{timing}")
+
+    if all(r["status"] == "ok" for r in results):
+        success("Environment looks good!")
+    elif any(r["status"] == "fail" for r in results):
+        warn("Some dependencies are missing or misconfigured. Please check your PATH and gradle.properties.")
+    else:
+        warn("Environment works, but some checks found ways to speed up builds.")
+
+@traced
+def handle_lint(args):
+    tasks = []
+    if args.fix:
+        log("Applying lint fixes...")
+        tasks = ["spotlessApply", "detekt"]
+    else:
+        log("Checking linting...")
+        tasks = ["spotlessCheck", "detekt"]
+    
+    run_gradle(tasks, msg="Linting...")
+    success("Linting complete.")
+
+@traced
+def handle_clean(args):
+    log("Cleaning project...")
+    run_gradle(["clean"], msg="Gradle cleaning...")
+    success("Project cleaned.")
+
+@traced
+def handle_open(args):
+    if args.target == "android":
+        log("Opening in Android Studio...")
+        if sys.platform == "darwin":
+            run_command(["open", "-a", "Android Studio", "."])
+        else:
+            run_command(["studio", "."])
+    elif args.target == "ios":
+        if sys.platform != "darwin":
+            error("iOS targets require macOS.")
+        log("Opening in Xcode...")
+        run_command(["open", "iosApp/iosApp.xcodeproj"])
+
+@traced
+def handle_coverage(args):
+    root = get_project_root()
+    html = args.html or args.open
+    if not args.no_run:
+        log("Generating coverage report...")
+        run_gradle(["koverXmlReport"] + (["koverHtmlReport"] if html else []), msg="Generating Kover reports...")
+    xml_path = root / KOVER_XML_REPORT
+    if not xml_path.exists():
+        error("Coverage report not found. Ensure Kover is correctly configured.")
+
+    sources = kotlin_source_index(root)
+    changed = changed_lines_since(args.diff) if args.diff else {}
+    # Only the changed files need per-line data, which keeps the streamed parse's memory flat
+    wanted = {key for key, path in sources.items() if path in changed}
+    report = parse_kover_report(xml_path, wanted)
+    if report is None:
+        error(f"Could not parse {KOVER_XML_REPORT}.")
+
+    summary = summarize_coverage(report, sources, read_module_graph(root))
+    baseline_path = get_state_dir() / "coverage-baseline.json"
+    baseline = load_json(baseline_path, None)
+    print_coverage_summary(summary, baseline)
+    if args.save_baseline:
+        save_json(baseline_path, dict(summary, commit=get_head_sha(), saved=time.time()))
+        success(f"Saved coverage baseline for {(get_head_sha() or '')[:7]}.")
+
+    if args.diff:
+        pct = print_diff_coverage(report, sources, changed, args.diff)
+        if args.fail_under is not None and pct is not None and pct < args.fail_under:
+            error(f"Diff coverage {pct:.1f}% is below {args.fail_under:.1f}%.")
+
+    if html:
+        report_path = root / "build/reports/kover/html/index.html"
+        if report_path.exists():
+            success(f"Report generated: {report_path}")
+            if args.open:
+                if sys.platform == "darwin":
+                    run_command(["open", str(report_path)])
+                else:
+                    log(f"View report at: file://{report_path}")
+
+@traced
+def handle_status(args):
+    log("Project Status Overview")
+    snapshot = get_git_snapshot(refresh=args.refresh)
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- GIT STATUS ---{Colors.NC}")
+    if snapshot["changes"]:
+        print_git_changes(snapshot["changes"])
+    else:
+        print(f" {Colors.GREEN}Clean (nothing to commit){Colors.NC}")
+    
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- ACTIVE WORKTREES ---{Colors.NC}")
+    for wt in snapshot["worktrees"]:
+        branch = f"[{wt['branch']}]" if wt["branch"] else "(detached HEAD)"
+        warm = format_warm_status(read_warm_status(Path(wt["path"])))
+        print(f" {Colors.BLUE}{wt['path']:40}{Colors.NC} {Colors.YELLOW}{wt['head'][:7]}{Colors.NC} "
+              f"{Colors.PURPLE}{branch}{Colors.NC}{warm}")
+
+# --- Watch Mode ---
+
+WATCH_INIT_SCRIPT = """// Generated by mm.py: one line per finished test so `mm watch` can stream results as they arrive
+gradle.beforeProject {
+    tasks.withType(Test::class.java).configureEach {
+        testLogging {
+            events("passed", "skipped", "failed")
+            exceptionFormat = org.gradle.api.tasks.testing.logging.TestExceptionFormat.SHORT
+        }
+    }
+}
+"""
+
+class InotifyWatcher:
+    # Raw inotify through ctypes: one watch per directory, with watches added as new directories appear
+    IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x8, 0x40, 0x80, 0x100, 0x200
+    IN_Q_OVERFLOW, IN_ISDIR = 0x4000, 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, roots):
+        import ctypes
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        for root in roots:
+            self.add_tree(root)
+
+    def add_tree(self, top):
+        for dirpath, dirnames, _ in os.walk(top):
+            dirnames[:] = [d for d in dirnames if d not in ("build", ".gradle")]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), self.MASK)
+            if wd >= 0:
+                self.dirs[wd] = dirpath
+
+    def events(self):
+        import struct
+        while True:
+            buf = os.read(self.fd, 65536)
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = struct.unpack_from("iIII", buf, offset)
+                name = buf[offset + 16:offset + 16 + length].rstrip(b"\0").decode(errors="replace")
+                offset += 16 + length
+                if mask & self.IN_Q_OVERFLOW:
+                    yield None
+                    continue
+                path = os.path.join(self.dirs.get(wd, ""), name)
+                if mask & self.IN_ISDIR:
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        self.add_tree(path)
+                    continue
+                yield path
+
+class PollingWatcher:
+    def __init__(self, roots, interval=WATCH_POLL_SECONDS):
+        self.roots = roots
+        self.interval = interval
+        self.mtimes = self.scan()
+
+    def scan(self):
+        mtimes = {}
+        for root in self.roots:
+            for path in iter_source_files(root, (".kt", ".kts")):
+                try:
+                    mtimes[str(path)] = path.stat().st_mtime_ns
+                except OSError:
+                    pass
+        return mtimes
+
+    def events(self):
+        while True:
+            time.sleep(self.interval)
+            current = self.scan()
+            for path in current.keys() | self.mtimes.keys():
+                if current.get(path) != self.mtimes.get(path):
+                    yield path
+            self.mtimes = current
+
+def make_watcher(roots, force_poll=False):
+    if sys.platform.startswith("linux") and not force_poll:
+        try:
+            return InotifyWatcher(roots), "inotify"
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots), "polling"
+
+def index_test_classes(root, graph, modules):
+    # Test class simple name -> [(module, fully qualified name)]
+    index = {}
+    for m in modules:
+        for cls in find_test_classes(root, graph[m]["dir"]):
+            index.setdefault(cls.rsplit(".", 1)[-1], []).append((m, cls))
+    return index
+
+def tests_for_changes(root, graph, modules, paths):
+    index = index_test_classes(root, graph, modules)
+    selected, unmapped = set(), []
+    for path in paths:
+        # KMP platform files are named Foo.jvm.kt / Foo.android.kt; their tests still target Foo
+        stem = Path(path).name.split(".")[0]
+        name = stem if stem.endswith("Test") else f"{stem}Test"
+        if name in index:
+            selected.update(index[name])
+        else:
+            unmapped.append(path)
+    return sorted(selected), unmapped
+
+class WatchRun:
+    def __init__(self, root, tests, init_script, verbose):
+        import subprocess
+        import threading
+        self.tests = tests
+        self.started = time.perf_counter()
+        self.counts = {"PASSED": 0, "FAILED": 0, "SKIPPED": 0}
+        self.cancelled = False
+        by_module = {}
+        for module, cls in tests:
+            by_module.setdefault(module, []).append(cls)
+        cmd = ["./gradlew"] + gradle_init_args(root) + ["-I", str(init_script), "--console=plain", "--continue"]
+        for module, classes in sorted(by_module.items()):
+            cmd.append(f"{module}:jvmTest")
+            for cls in classes:
+                cmd.extend(["--tests", cls])
+        # Its own session, so cancelling signals the Gradle client and wrapper but never this process
+        self.proc = subprocess.Popen(cmd, cwd=root, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                     errors="replace", start_new_session=True)
+        self.reader = threading.Thread(target=self.stream, args=(verbose,), daemon=True)
+        self.reader.start()
+
+    def stream(self, verbose):
+        in_failure = False
+        with self.proc.stdout:
+            for line in self.proc.stdout:
+                line = line.rstrip("\n")
+                result = line.rsplit(" ", 1)[-1] if " > " in line else None
+                if result in self.counts:
+                    self.counts[result] += 1
+                    color = {"PASSED": Colors.GREEN, "FAILED": Colors.RED, "SKIPPED": Colors.YELLOW}[result]
+                    print(f" {color}{line}{Colors.NC}", flush=True)
+                elif line.startswith("* What went wrong:"):
+                    in_failure = True
+                elif in_failure and line.startswith("* Try:"):
+                    in_failure = False
+                elif verbose or in_failure or line.startswith("e: ") or (
+                        line.startswith("    ") and self.counts["FAILED"] and not self.cancelled):
+                    print(f" {Colors.GRAY}{line}{Colors.NC}", flush=True)
+
+    def cancel(self):
+        import signal
+        import subprocess
+        self.cancelled = True
+        try:
+            # SIGINT is what Ctrl-C sends; the Gradle client turns it into a build cancellation in the daemon
+            os.killpg(self.proc.pid, signal.SIGINT)
+        except ProcessLookupError:
+            pass
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+            self.proc.wait()
+        self.reader.join(timeout=2)
+
+    def report(self):
+        self.reader.join()
+        elapsed = time.perf_counter() - self.started
+        c = self.counts
+        summary = f"{c['PASSED']} passed, {c['FAILED']} failed, {c['SKIPPED']} skipped in {elapsed:.1f}s"
+        if self.proc.returncode == 0:
+            success(summary)
+        else:
+            print(f"{Colors.RED}✘{Colors.NC} {Colors.RED}{Colors.BOLD}{summary} (Gradle exited with "
+                  f"{self.proc.returncode}){Colors.NC}")
+
+@traced
+def handle_watch(args):
+    import queue
+    import threading
+    root = get_project_root()
+    graph = read_module_graph(root)
+    modules = [m for m in graph if graph[m]["jvm"] and (not args.module or m in args.module)]
+    if not modules:
+        error("No JVM-testable modules to watch.")
+    roots = [str(root / graph[m]["dir"] / "src") for m in modules if (root / graph[m]["dir"] / "src").is_dir()]
+    watcher, kind = make_watcher(roots, args.poll)
+    init_script = get_state_dir() / "watch-init.gradle.kts"
+    if not init_script.exists() or init_script.read_text() != WATCH_INIT_SCRIPT:
+        init_script.write_text(WATCH_INIT_SCRIPT)
+
+    changes = queue.Queue()
+
+    def pump():
+        for path in watcher.events():
+            changes.put(path)
+
+    threading.Thread(target=pump, daemon=True).start()
+    log(f"Watching {len(roots)} source tree(s) with {kind} ({', '.join(modules)}). Ctrl-C to stop.")
+
+    debounce = args.debounce / 1000
+    pending, overflowed, deadline, run = set(), False, None, None
+    try:
+        while True:
+            try:
+                path = changes.get(timeout=max(0.05, deadline - time.monotonic()) if deadline else 0.2)
+                # None marks a dropped event queue; fall back to the test classes of everything watched
+                if path is None or path.endswith((".kt", ".kts")):
+                    if path is None:
+                        overflowed = True
+                    else:
+                        pending.add(path)
+                    deadline = time.monotonic() + debounce
+                continue
+            except queue.Empty:
+                pass
+            if deadline and time.monotonic() >= deadline:
+                carried = set()
+                if run and run.proc.poll() is None:
+                    warn("Newer changes arrived; cancelling the in-flight run.")
+                    run.cancel()
+                    # Whatever the cancelled run was checking still needs checking
+                    carried = set(run.tests)
+                paths = sorted(pending)
+                if overflowed:
+                    paths = [str(f) for r in roots for f in iter_source_files(r, ".kt")]
+                pending, overflowed, deadline = set(), False, None
+                tests, unmapped = tests_for_changes(root, graph, modules, paths)
+                tests = sorted(set(tests) | carried)
+                print(f"\n{Colors.CYAN}{Colors.BOLD}--- {time.strftime('%H:%M:%S')} "
+                      f"{len(paths)} changed file(s) ---{Colors.NC}")
+                for p in unmapped:
+                    print(f" {Colors.GRAY}no test class for {os.path.relpath(p, root)}{Colors.NC}")
+                if tests:
+                    log(f"Running {len(tests)} test class(es): {', '.join(cls.rsplit('.', 1)[-1] for _, cls in tests)}")
+                    run = WatchRun(root, tests, init_script, args.verbose)
+            if run and run.proc.poll() is not None:
+                if not run.cancelled:
+                    run.report()
+                run = None
+    except KeyboardInterrupt:
+        if run and run.proc.poll() is None:
+            run.cancel()
+        print()
+        log("Stopped watching.")
+
+# --- Git Snapshot ---
+
+def parse_status_v2(raw):
+    info = {"branch": "HEAD", "oid": None, "upstream": None, "ahead": 0, "behind": 0, "changes": []}
+    records = raw.split("\0")
+    i = 0
+    while i < len(records):
+        rec = records[i]
+        i += 1
+        if not rec:
+            continue
+        kind = rec[0]
+        if kind == "#":
+            key, _, value = rec[2:].partition(" ")
+            if key == "branch.oid":
+                info["oid"] = None if value == "(initial)" else value
+            elif key == "branch.head":
+                info["branch"] = "HEAD" if value == "(detached)" else value
+            elif key == "branch.upstream":
+                info["upstream"] = value
+            elif key == "branch.ab":
+                ahead, behind = value.split()
+                info["ahead"], info["behind"] = int(ahead), -int(behind)
+        elif kind == "1":
+            parts = rec.split(" ", 8)
+            info["changes"].append({"xy": parts[1].replace(".", " "), "path": parts[8], "orig": None})
+        elif kind == "2":
+            # Renames/copies carry the original path as the next NUL-separated record
+            parts = rec.split(" ", 9)
+            info["changes"].append({"xy": parts[1].replace(".", " "), "path": parts[9], "orig": records[i]})
+            i += 1
+        elif kind == "u":
+            parts = rec.split(" ", 10)
+            info["changes"].append({"xy": parts[1], "path": parts[10], "orig": None})
+        elif kind == "?":
+            info["changes"].append({"xy": "??", "path": rec[2:], "orig": None})
+    return info
+
+def parse_worktree_list(raw):
+    worktrees = []
+    current = None
+    for line in raw.splitlines():
+        key, _, value = line.partition(" ")
+        if key == "worktree":
+            current = {"path": value, "head": "", "branch": None}
+            worktrees.append(current)
+        elif current is None:
+            continue
+        elif key == "HEAD":
+            current["head"] = value
+        elif key == "branch":
+            current["branch"] = value[len("refs/heads/"):] if value.startswith("refs/heads/") else value
+    return worktrees
+
+def build_git_snapshot(cwd=None, head_info=None):
+    import subprocess
+    # The queries are independent, so run them side by side instead of back to back. `head_info` (log and
+    # worktrees) only changes with HEAD or the worktree list, so a cached copy skips those two.
+    cmds = {"status": ["git", "status", "--porcelain=v2", "--branch", "-z"]}
+    if head_info is None:
+        cmds["log"] = ["git", "log", "-n", "3", "--format=%h %s"]
+        cmds["worktrees"] = ["git", "worktree", "list", "--porcelain"]
+    with TRACER.span("git snapshot", "subprocess", argv=list(cmds.values())):
+        procs = {k: subprocess.Popen(c, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+                 for k, c in cmds.items()}
+        out = {k: p.communicate()[0] for k, p in procs.items()}
+    snapshot = parse_status_v2(out["status"])
+    if head_info is None:
+        head_info = {
+            "log": [line.split(" ", 1) if " " in line else [line, ""] for line in out["log"].splitlines()],
+            "worktrees": parse_worktree_list(out["worktrees"]),
+        }
+    snapshot.update(head_info)
+    return snapshot
+
+def read_head(gitdir, commondir):
+    head = (gitdir / "HEAD").read_text().strip()
+    if not head.startswith("ref: "):
+        return head, head
+    ref = head[len("ref: "):]
+    loose = commondir / ref
+    if loose.exists():
+        return head, loose.read_text().strip()
+    packed = commondir / "packed-refs"
+    if packed.exists():
+        with open(packed, "r") as f:
+            for line in f:
+                if line.rstrip().endswith(" " + ref):
+                    return head, line.split(" ", 1)[0]
+    return head, None
+
+def git_snapshot_key(dirs):
+    _, gitdir, commondir = dirs
+    head, sha = read_head(gitdir, commondir)
+    key = {"head": head, "sha": sha, "worktrees": {}}
+    # Adding/removing a worktree touches the directory; a commit inside one only moves its branch ref, so
+    # every worktree's HEAD is resolved to a SHA as well
+    worktrees = commondir / "worktrees"
+    try:
+        st = worktrees.stat()
+        key["worktrees"][""] = [st.st_mtime_ns, st.st_size]
+    except OSError:
+        return key
+    for wt_gitdir in sorted(p for p in worktrees.iterdir() if p.is_dir()):
+        try:
+            key["worktrees"][wt_gitdir.name] = list(read_head(wt_gitdir, commondir))
+        except OSError:
+            pass
+    return key
+
+def get_git_snapshot(refresh=False):
+    # Working-tree changes are never cached: `git status` always runs, so an edit made a second ago shows up.
+    # Only the log and worktree list are reused, keyed by HEAD and the worktrees directory.
+    dirs = find_git_dirs(get_project_root())
+    if not dirs:
+        return build_git_snapshot(cwd=get_project_root())
+    cache_path = get_state_dir() / "git-snapshot.json"
+    key = git_snapshot_key(dirs)
+    cached = None if refresh else load_json(cache_path, None)
+    if cached and cached.get("key") == key:
+        return build_git_snapshot(cwd=dirs[0], head_info=cached["head_info"])
+    snapshot = build_git_snapshot(cwd=dirs[0])
+    save_json(cache_path, {"key": key, "head_info": {k: snapshot[k] for k in ("log", "worktrees")}})
+    return snapshot
+
+def print_git_changes(changes):
+    for c in changes:
+        mode = c["xy"]
+        file = f"{c['orig']} -> {c['path']}" if c["orig"] else c["path"]
+        color = Colors.GREEN if 'A' in mode or '?' in mode else Colors.YELLOW
+        print(f" {color}{mode}{Colors.NC} {file}")
+
+# --- Benchmarks ---
+
+TEST_SOURCE_SET_TASKS = {
+    "commonTest": "jvmTest",
+    "jvmTest": "jvmTest",
+    "desktopTest": "jvmTest",
+    "test": "test",
+    "androidUnitTest": "testDebugUnitTest",
+}
+TIME_UNITS_MS = {"ns": 1e-6, "us": 1e-3, "µs": 1e-3, "ms": 1.0, "s": 1000.0}
+BENCH_RESULT_RE = re.compile(r"BENCHMARK_RESULT:\s*(.+)")
+BENCH_METRIC_RE = re.compile(r"^\s*([^:]+?)\s*:\s*(-?\d+(?:\.\d+)?)\s*([a-zµ]*)\s*$", re.IGNORECASE)
+
+def find_perf_tests(root, name_filter=None):
+    tests = []
+    for path in sorted(iter_source_files(root)):
+        if not re.match(r".*Perf.*Test\.kt$", path.name):
+            continue
+        parts = path.relative_to(root).parts
+        if "src" not in parts:
+            continue
+        idx = parts.index("src")
+        task = TEST_SOURCE_SET_TASKS.get(parts[idx + 1]) if idx + 1 < len(parts) else None
+        if idx == 0 or not task:
+            continue
+        package = read_kotlin_package(path)
+        fqcn = f"{package}.{path.stem}" if package else path.stem
+        if name_filter and name_filter not in fqcn:
+            continue
+        tests.append({
+            "module": ":" + ":".join(parts[:idx]),
+            "module_dir": root.joinpath(*parts[:idx]),
+            "task": task,
+            "class": fqcn,
+        })
+    return tests
+
+def bench_result_path(test):
+    return test["module_dir"] / "build" / "test-results" / test["task"] / f"TEST-{test['class']}.xml"
+
+def run_perf_tests(tests, cwd=None, quiet=False):
+    # One Gradle invocation for every module/task pair; `--rerun` only forces the test task itself
+    by_task = {}
+    for t in tests:
+        by_task.setdefault(f"{t['module']}:{t['task']}", []).append(t["class"])
+        bench_result_path(t).unlink(missing_ok=True)
+    gradle_args = []
+    for task, classes in by_task.items():
+        gradle_args.extend([task, "--rerun"])
+        for c in classes:
+            gradle_args.extend(["--tests", c])
+    if not quiet:
+        return run_gradle(gradle_args, cwd=cwd, msg=f"Running {len(tests)} benchmark class(es)...")
+    res = run_gradle(gradle_args, cwd=cwd, show_spinner=False, capture_output=True)
+    if res.returncode != 0:
+        print((res.stdout or "")[-4000:] + (res.stderr or "")[-4000:])
+        error(f"Benchmark run failed in {cwd or get_project_root()}")
+    return res
+
+def parse_bench_xml(path):
+    import xml.etree.ElementTree as ET
+    metrics = {}
+    suite = ET.parse(path).getroot()
+    simple = suite.get("name", path.stem).rsplit(".", 1)[-1]
+    for case in suite.iter("testcase"):
+        metrics[f"{simple}.{case.get('name')}"] = {"value": float(case.get("time", 0)) * 1000.0, "unit": "ms"}
+    output = "\n".join(el.text or "" for el in suite.iter("system-out"))
+    for line in output.splitlines():
+        m = BENCH_RESULT_RE.search(line)
+        if not m:
+            continue
+        for piece in m.group(1).split(","):
+            pm = BENCH_METRIC_RE.match(piece)
+            if not pm:
+                continue
+            label, value, unit = pm.group(1), float(pm.group(2)), pm.group(3).lower()
+            key = f"{simple}.{re.sub(r'[^a-z0-9]+', '_', label.lower()).strip('_')}"
+            if unit in TIME_UNITS_MS:
+                metrics[key] = {"value": value * TIME_UNITS_MS[unit], "unit": "ms"}
+            else:
+                metrics[key] = {"value": value, "unit": unit}
+    return metrics
+
+def collect_bench_metrics(tests):
+    metrics = {}
+    for t in tests:
+        path = bench_result_path(t)
+        if not path.exists():
+            warn(f"No results for {t['class']} ({path.name} missing)")
+            continue
+        metrics.update(parse_bench_xml(path))
+    return metrics
+
+def find_bench_baseline(history, current_key, baseline_ref):
+    runs = history.get("runs", {})
+    res = run_command(["git", "merge-base", "HEAD", baseline_ref], capture_output=True)
+    if res.returncode == 0:
+        sha = res.stdout.strip()
+        if sha in runs and sha != current_key:
+            return sha, runs[sha]
+    # Fall back to the most recent clean run that is not the one we just recorded
+    candidates = [(r["timestamp"], k) for k, r in runs.items() if k != current_key and not r.get("dirty")]
+    if not candidates:
+        return None, None
+    key = max(candidates)[1]
+    return key, runs[key]
+
+def compare_bench_metrics(baseline, current, threshold):
+    rows = []
+    for name in sorted(current):
+        cur = current[name]
+        base = baseline.get(name)
+        if not base or not base["value"]:
+            rows.append((name, None, cur, None, False))
+            continue
+        delta = (cur["value"] - base["value"]) / base["value"] * 100.0
+        # Only time-based metrics are gated: lower is better, anything else is informational
+        regressed = cur["unit"] == "ms" and delta > threshold
+        rows.append((name, base, cur, delta, regressed))
+    return rows
+
+@traced
+def handle_bench(args):
+    if args.bench_command == "compare":
+        return handle_bench_compare(args)
+    from datetime import datetime
+    tests = find_perf_tests(get_project_root(), args.filter)
+    if not tests:
+        error("No *Perf*Test classes found.")
+    log(f"Found {len(tests)} benchmark class(es)...")
+    for t in tests:
+        print(f" {Colors.GRAY}•{Colors.NC} {t['module']}:{t['task']} {Colors.CYAN}{t['class']}{Colors.NC}")
+
+    if not args.no_run:
+        run_perf_tests(tests)
+    metrics = collect_bench_metrics(tests)
+    if not metrics:
+        error("No benchmark results were produced.")
+
+    sha = get_head_sha() or "unknown"
+    dirty = is_tree_dirty()
+    key = f"{sha}-dirty" if dirty else sha
+    history_path = get_state_dir() / "bench-history.json"
+    history = load_json(history_path, {"runs": {}})
+    history.setdefault("runs", {})[key] = {
+        "sha": sha,
+        "dirty": dirty,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "metrics": metrics,
+    }
+    save_json(history_path, history)
+    log(f"Recorded {len(metrics)} metric(s) for {key[:12]}{' (dirty)' if dirty else ''}")
+
+    base_key, baseline = find_bench_baseline(history, key, args.baseline)
+    if not baseline:
+        warn("No baseline recorded yet; nothing to compare against.")
+        return
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- BENCHMARKS vs {base_key[:12]} ---{Colors.NC}")
+    rows = compare_bench_metrics(baseline["metrics"], metrics, args.threshold)
+    for name, base, cur, delta, regressed in rows:
+        current_text = f"{cur['value']:.2f} {cur['unit']}"
+        if delta is None:
+            print(f" {Colors.GRAY}•{Colors.NC} {name:50} {current_text:>14} {Colors.GRAY}(new){Colors.NC}")
+            continue
+        color = Colors.RED if regressed else (Colors.GREEN if delta < 0 else Colors.GRAY)
+        print(f" {color}{'✘' if regressed else '•'}{Colors.NC} {name:50} {current_text:>14} "
+              f"{Colors.GRAY}was {base['value']:.2f}{Colors.NC} {color}{delta:+.1f}%{Colors.NC}")
+
+    regressions = [r for r in rows if r[4]]
+    if regressions:
+        error(f"{len(regressions)} benchmark metric(s) regressed by more than {args.threshold:.1f}%.")
+    success("No benchmark regressions detected.")
+
+def bench_stats(values, confidence=0.95, resamples=2000, seed=0):
+    # Percentile bootstrap of the median: makes no normality assumption and is stable for small N
+    import random
+    import statistics
+    rng = random.Random(seed)
+    n = len(values)
+    medians = sorted(statistics.median(rng.choices(values, k=n)) for _ in range(resamples))
+    lo = medians[int((1 - confidence) / 2 * resamples)]
+    hi = medians[min(resamples - 1, int((1 + confidence) / 2 * resamples))]
+    return statistics.median(values), lo, hi
+
+def bench_ratio_ci(a_values, b_values, confidence=0.95, resamples=2000, seed=0):
+    # A and B are resampled together in every iteration; pairing two independently sorted bootstraps instead
+    # would line up their quantiles and make the interval far too narrow
+    import random
+    import statistics
+    rng = random.Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        b = statistics.median(rng.choices(b_values, k=len(b_values)))
+        if b:
+            ratios.append(statistics.median(rng.choices(a_values, k=len(a_values))) / b)
+    ratios.sort()
+    lo = ratios[int((1 - confidence) / 2 * len(ratios))]
+    hi = ratios[min(len(ratios) - 1, int((1 + confidence) / 2 * len(ratios)))]
+    return lo, hi
+
+def resolve_commit(ref):
+    res = run_command(["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"], capture_output=True)
+    if res.returncode != 0 or not res.stdout.strip():
+        error(f"Unknown git ref: {ref}")
+    return res.stdout.strip()
+
+@traced
+def handle_bench_compare(args):
+    from concurrent.futures import ThreadPoolExecutor
+    if args.reps < 2:
+        error("--reps must be at least 2 to estimate a confidence interval.")
+    refs = [args.ref_a, args.ref_b]
+    shas = [resolve_commit(r) for r in refs]
+    dirs = [safe_path_join(get_worktrees_dir(), f"bench-{label}-{sha[:8]}") for label, sha in zip("ab", shas)]
+    for d in dirs:
+        if d.exists():
+            error(f"Worktree directory already exists: {d} (remove it or run 'mm task clean')")
+
+    get_worktrees_dir().mkdir(exist_ok=True)
+    created = []
+    try:
+        for ref, sha, d in zip(refs, shas, dirs):
+            log(f"Creating throwaway worktree for {ref} ({sha[:8]})...")
+            run_command(["git", "worktree", "add", "--detach", str(d), sha], capture_output=True)
+            if not d.exists():
+                error(f"Could not create worktree for {ref}.")
+            created.append(d)
+            copy_config_files(d)
+
+        tests = [find_perf_tests(d, args.filter) for d in dirs]
+        for ref, t in zip(refs, tests):
+            if not t:
+                error(f"No *Perf*Test classes found at {ref}.")
+
+        # Compilation and JIT-independent warmup are not measured, so both sides can share the machine here
+        with Spinner("Compiling and warming up both refs..."):
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                list(pool.map(lambda i: run_perf_tests(tests[i], cwd=dirs[i], quiet=True), range(2)))
+
+        # ABBA ordering spreads thermal drift and background load evenly over both sides
+        samples = [{}, {}]
+        for rep in range(args.reps):
+            order = (0, 1) if rep % 2 == 0 else (1, 0)
+            for side in order:
+                with Spinner(f"Repetition {rep + 1}/{args.reps}: {refs[side]}..."):
+                    run_perf_tests(tests[side], cwd=dirs[side], quiet=True)
+                for name, metric in collect_bench_metrics(tests[side]).items():
+                    samples[side].setdefault(name, []).append(metric)
+    finally:
+        if not args.keep:
+            for d in created:
+                run_command(["git", "worktree", "remove", "--force", str(d)], capture_output=True)
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- {refs[0]} (A) vs {refs[1]} (B), {args.reps} interleaved runs ---{Colors.NC}")
+    print(f" {Colors.GRAY}{'metric':44} {'A median [95% CI]':>26} {'B median [95% CI]':>26} {'speedup A/B':>22}{Colors.NC}")
+    for name in sorted(set(samples[0]) & set(samples[1])):
+        a_vals = [m["value"] for m in samples[0][name]]
+        b_vals = [m["value"] for m in samples[1][name]]
+        unit = samples[0][name][0]["unit"]
+        a_med, a_lo, a_hi = bench_stats(a_vals)
+        b_med, b_lo, b_hi = bench_stats(b_vals, seed=1)
+        a_text = f"{a_med:.2f} [{a_lo:.2f}, {a_hi:.2f}]"
+        b_text = f"{b_med:.2f} [{b_lo:.2f}, {b_hi:.2f}]"
+        if unit != "ms" or not b_med:
+            print(f" {name:44} {a_text:>26} {b_text:>26} {Colors.GRAY}{'n/a':>22}{Colors.NC}")
+            continue
+        r_lo, r_hi = bench_ratio_ci(a_vals, b_vals)
+        speedup = a_med / b_med
+        # Only call it a change when the whole interval sits on one side of 1.0
+        color = Colors.GREEN if r_lo > 1 else (Colors.RED if r_hi < 1 else Colors.GRAY)
+        speed_text = f"x{speedup:.3f} [{r_lo:.3f}, {r_hi:.3f}]"
+        print(f" {name:44} {a_text:>26} {b_text:>26} {color}{speed_text:>22}{Colors.NC}")
+
+    only = set(samples[0]) ^ set(samples[1])
+    if only:
+        warn(f"{len(only)} metric(s) only exist on one side: {', '.join(sorted(only))}")
+    success("Comparison complete (speedup > 1 means B is faster).")
+
+# --- Build Profiles ---
+
+PROFILE_DURATION_RE = re.compile(r"^(?:(\d+)d)?(?:(\d+)h)?(?:(\d+)m)?(?:([\d.]+)s)?$")
+
+def parse_profile_duration(text):
+    m = PROFILE_DURATION_RE.match(text.strip())
+    if not m or not any(m.groups()):
+        return 0.0
+    days, hours, minutes, seconds = m.groups()
+    return int(days or 0) * 86400 + int(hours or 0) * 3600 + int(minutes or 0) * 60 + float(seconds or 0)
+
+def parse_gradle_profile(path):
+    from html.parser import HTMLParser
+
+    # Gradle's profile report is one tab per <h2> section, each holding a plain <table> of text cells
+    class ProfileParser(HTMLParser):
+        def __init__(self):
+            super().__init__()
+            self.sections = {}
+            self.section = None
+            self.row = None
+            self.cell = None
+            self.in_h2 = False
+
+        def handle_starttag(self, tag, attrs):
+            if tag == "h2":
+                self.in_h2, self.section = True, ""
+            elif tag == "tr":
+                self.row = []
+            elif tag == "td" and self.row is not None:
+                self.cell = ""
+
+        def handle_endtag(self, tag):
+            if tag == "h2":
+                self.in_h2 = False
+                self.sections.setdefault(self.section, [])
+            elif tag == "td" and self.cell is not None:
+                self.row.append(self.cell.strip())
+                self.cell = None
+            elif tag == "tr" and self.row:
+                self.sections.setdefault(self.section, []).append(self.row)
+                self.row = None
+
+        def handle_data(self, data):
+            if self.in_h2:
+                self.section += data.strip()
+            elif self.cell is not None:
+                self.cell += data
+
+    parser = ProfileParser()
+    with open(path, "r", encoding="utf-8") as f:
+        parser.feed(f.read())
+    summary = {row[0]: parse_profile_duration(row[1]) for row in parser.sections.get("Summary", []) if len(row) >= 2}
+    tasks, outcomes = {}, {}
+    for row in parser.sections.get("Task Execution", []):
+        if len(row) < 2 or row[-1] == "(total)" or row[0].count(":") < 1:
+            continue
+        result = row[2] if len(row) > 2 and row[2] else "EXECUTED"
+        tasks[row[0]] = parse_profile_duration(row[1])
+        outcomes[result] = outcomes.get(result, 0) + 1
+    return {
+        "total": summary.get("Total Build Time", 0.0),
+        "configuration": sum(summary.get(k, 0.0) for k in ("Startup", "Settings and buildSrc",
+                                                            "Loading Projects", "Configuring Projects")),
+        "execution": summary.get("Task Execution", 0.0),
+        "tasks": tasks,
+        "outcomes": outcomes,
+    }
+
+def snapshot_profile_state(cwd=None):
+    return {"started": time.time()}
+
+def configuration_cache_line(line):
+    # Gradle reports the outcome itself; an entry re-stored under the same key after a build-script change is a miss
+    if line.startswith(("Reusing configuration cache", "Configuration cache entry reused")):
+        return "hit"
+    if line.startswith(("Calculating task graph as", "Configuration cache entry stored",
+                        "Configuration cache entry discarded")):
+        return "miss"
+    return None
+
+def ingest_gradle_profile(tasks, state, cwd=None, configuration_cache="disabled"):
+    from datetime import datetime
+    root = Path(cwd) if cwd else get_project_root()
+    reports = [p for p in (root / "build" / "reports" / "profile").glob("profile-*.html")
+               if p.stat().st_mtime >= state["started"] - 1]
+    if not reports:
+        warn("Gradle did not write a profile report.")
+        return None
+    report = max(reports, key=lambda p: p.stat().st_mtime)
+    run = parse_gradle_profile(report)
+    # Keep the history compact: the 50 slowest tasks per run are plenty for trends
+    run["tasks"] = dict(sorted(run["tasks"].items(), key=lambda kv: kv[1], reverse=True)[:50])
+    run.update({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "sha": get_head_sha(cwd) or "unknown",
+        "requested": tasks,
+        "configuration_cache": configuration_cache,
+        "report": str(report),
+    })
+    history_path = get_state_dir(root) / "profile-history.json"
+    history = load_json(history_path, [])
+    history.append(run)
+    save_json(history_path, history[-PROFILE_HISTORY_RUNS:])
+    print_profile_run(run, top=5)
+    return run
+
+def print_profile_run(run, top):
+    cc_color = {"hit": Colors.GREEN, "miss": Colors.YELLOW}.get(run["configuration_cache"], Colors.GRAY)
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- BUILD PROFILE ({run['timestamp']}, {run['sha'][:8]}) ---{Colors.NC}")
+    print(f" {Colors.BOLD}Total:{Colors.NC} {run['total']:.1f}s  {Colors.BOLD}Configuration:{Colors.NC} {run['configuration']:.1f}s  "
+          f"{Colors.BOLD}Execution:{Colors.NC} {run['execution']:.1f}s  "
+          f"{Colors.BOLD}Config cache:{Colors.NC} {cc_color}{run['configuration_cache']}{Colors.NC}")
+    outcomes = ", ".join(f"{count} {name}" for name, count in sorted(run["outcomes"].items()))
+    if outcomes:
+        print(f" {Colors.BOLD}Tasks:{Colors.NC} {outcomes}")
+    for task, secs in sorted(run["tasks"].items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        print(f" {secs:8.2f}s {Colors.BLUE}{task}{Colors.NC}")
+
+@traced
+def handle_profile(args):
+    history = load_json(get_state_dir() / "profile-history.json", [])
+    if not history:
+        error("No profiled builds yet. Run 'mm build <target> --profile' or 'mm test --profile' first.")
+    print_profile_run(history[-1], top=args.top)
+
+    runs = history[-args.runs:]
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- TREND (last {len(runs)} runs) ---{Colors.NC}")
+    print(f" {Colors.GRAY}{'when':19} {'sha':8} {'total':>8} {'config':>8} {'exec':>8} {'cc':>6}  tasks{Colors.NC}")
+    for run in runs:
+        print(f" {run['timestamp']:19} {run['sha'][:8]:8} {run['total']:7.1f}s {run['configuration']:7.1f}s "
+              f"{run['execution']:7.1f}s {run['configuration_cache']:>6}  {Colors.GRAY}{' '.join(run['requested'])[:40]}{Colors.NC}")
+    cc = [r["configuration_cache"] for r in runs if r["configuration_cache"] in ("hit", "miss")]
+    if cc:
+        log(f"Configuration cache hit rate: {cc.count('hit') / len(cc) * 100:.0f}% ({cc.count('hit')}/{len(cc)})")
+
+    totals = {}
+    for run in runs:
+        for task, secs in run["tasks"].items():
+            totals.setdefault(task, []).append(secs)
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- SLOWEST TASKS (average over runs) ---{Colors.NC}")
+    ranked = sorted(totals.items(), key=lambda kv: sum(kv[1]) / len(kv[1]), reverse=True)[:args.top]
+    for task, values in ranked:
+        avg = sum(values) / len(values)
+        latest = history[-1]["tasks"].get(task)
+        trend = f"{Colors.GRAY}latest {latest:.2f}s{Colors.NC}" if latest is not None else ""
+        print(f" {avg:8.2f}s {Colors.BLUE}{task:60}{Colors.NC} {Colors.GRAY}x{len(values)}{Colors.NC} {trend}")
+
+# --- Coverage ---
+
+def coverage_pct(covered, missed):
+    return covered / (covered + missed) * 100 if covered + missed else 100.0
+
+def parse_kover_report(path, line_files=()):
+    # Kover writes JaCoCo-format XML: report > package > (class | sourcefile > line*) with <counter>s at each level.
+    # iterparse + clearing finished classes/sourcefiles keeps memory flat however large the report gets.
+    import xml.etree.ElementTree as ET
+    report = {"totals": {}, "files": {}, "lines": {}}
+    stack = []
+    package = sourcefile = None
+    try:
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                stack.append(elem.tag)
+                if elem.tag == "package":
+                    package = elem.get("name")
+                elif elem.tag == "sourcefile":
+                    sourcefile = f"{package}/{elem.get('name')}"
+                continue
+            stack.pop()
+            parent = stack[-1] if stack else None
+            if elem.tag == "counter":
+                counts = {"covered": int(elem.get("covered")), "missed": int(elem.get("missed"))}
+                if parent == "report":
+                    report["totals"][elem.get("type")] = counts
+                elif parent == "sourcefile" and elem.get("type") in ("LINE", "BRANCH"):
+                    report["files"].setdefault(sourcefile, {})[elem.get("type")] = counts
+            elif elem.tag == "line" and sourcefile in line_files:
+                # A line counts as covered once any of its instructions ran; lines absent from the report aren't code
+                report["lines"].setdefault(sourcefile, {})[int(elem.get("nr"))] = int(elem.get("ci", 0)) > 0
+            elif elem.tag in ("class", "sourcefile", "package"):
+                elem.clear()
+    except (ET.ParseError, OSError, TypeError, ValueError):
+        return None
+    return report
+
+def kotlin_source_index(root):
+    # Maps the report's "<package path>/<file name>" keys back to repository paths
+    index = {}
+    for path in iter_source_files(root, ".kt"):
+        key = f"{read_kotlin_package(path).replace('.', '/')}/{path.name}"
+        index.setdefault(key, str(path.relative_to(root)))
+    return index
+
+def changed_lines_since(base):
+    import subprocess
+    res = run_command(["git", "merge-base", "HEAD", base], capture_output=True)
+    if res.returncode != 0:
+        error(f"Could not find a merge-base with '{base}'.")
+    changed = {}
+    path = None
+    proc = subprocess.Popen(["git", "-c", "core.quotepath=off", "diff", "-U0", "--no-color", "--no-ext-diff",
+                             res.stdout.strip(), "--", "*.kt"], stdout=subprocess.PIPE, text=True, errors="replace")
+    with proc.stdout:
+        for line in proc.stdout:
+            if line.startswith("+++ "):
+                path = line[6:].rstrip("\n") if line.startswith("+++ b/") else None
+            elif line.startswith("@@ ") and path:
+                m = re.match(r"@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@", line)
+                if m:
+                    start, count = int(m.group(1)), int(m.group(2) or 1)
+                    changed.setdefault(path, set()).update(range(start, start + count))
+    proc.wait()
+    # Untracked files are new in their entirety
+    root = get_project_root()
+    for f in changed_files_since(base):
+        if f.endswith(".kt") and f not in changed and (root / f).exists():
+            with open(root / f, "rb") as fh:
+                changed[f] = set(range(1, sum(1 for _ in fh) + 1))
+    return changed
+
+def summarize_coverage(report, sources, graph):
+    modules = {}
+    files = {}
+    for key, counters in report["files"].items():
+        path = sources.get(key, key)
+        files[path] = counters
+        module = module_for_path(graph, path) or "(unmapped)"
+        for kind, c in counters.items():
+            agg = modules.setdefault(module, {}).setdefault(kind, {"covered": 0, "missed": 0})
+            agg["covered"] += c["covered"]
+            agg["missed"] += c["missed"]
+    totals = {kind: c for kind, c in report["totals"].items() if kind in ("LINE", "BRANCH")}
+    return {"totals": totals, "modules": modules, "files": files}
+
+def format_coverage(counters, kind, base_counters=None):
+    c = counters.get(kind)
+    if not c:
+        return f"{'-':>8}"
+    pct = coverage_pct(c["covered"], c["missed"])
+    text = f"{pct:7.1f}%"
+    base = (base_counters or {}).get(kind)
+    if base:
+        delta = pct - coverage_pct(base["covered"], base["missed"])
+        if abs(delta) >= 0.05:
+            color = Colors.GREEN if delta > 0 else Colors.RED
+            text += f" {color}{delta:+.1f}{Colors.NC}"
+    return text
+
+def print_coverage_summary(summary, baseline):
+    base_modules = (baseline or {}).get("modules", {})
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- COVERAGE ---{Colors.NC}")
+    if baseline:
+        print(f" {Colors.GRAY}Deltas against the baseline from {(baseline.get('commit') or '?')[:7]}{Colors.NC}")
+    print(f" {Colors.BOLD}{'Module':24} {'Lines':>8}  {'Branches':>8}{Colors.NC}")
+    for module in sorted(summary["modules"]):
+        counters = summary["modules"][module]
+        print(f" {Colors.BLUE}{module:24}{Colors.NC} {format_coverage(counters, 'LINE', base_modules.get(module))}  "
+              f"{format_coverage(counters, 'BRANCH', base_modules.get(module))}")
+    totals = summary["totals"]
+    base_totals = (baseline or {}).get("totals")
+    print(f" {Colors.BOLD}{'Total':24}{Colors.NC} {format_coverage(totals, 'LINE', base_totals)}  "
+          f"{format_coverage(totals, 'BRANCH', base_totals)}")
+
+def compress_ranges(numbers):
+    ranges = []
+    for n in sorted(numbers):
+        if ranges and n == ranges[-1][1] + 1:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+def print_diff_coverage(report, sources, changed, base):
+    paths = {path: key for key, path in sources.items()}
+    total_covered = total_missed = 0
+    rows = []
+    for path in sorted(changed):
+        lines = report["lines"].get(paths.get(path), {})
+        executable = [n for n in changed[path] if n in lines]
+        if not executable:
+            continue
+        missed = [n for n in executable if not lines[n]]
+        total_covered += len(executable) - len(missed)
+        total_missed += len(missed)
+        rows.append((path, len(executable) - len(missed), missed))
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- DIFF COVERAGE vs {base} ---{Colors.NC}")
+    if not rows:
+        print(f" {Colors.GRAY}No changed executable lines.{Colors.NC}")
+        return None
+    for path, covered, missed in rows:
+        pct = coverage_pct(covered, len(missed))
+        color = Colors.GREEN if not missed else Colors.YELLOW
+        detail = f" {Colors.GRAY}missed: {compress_ranges(missed)}{Colors.NC}" if missed else ""
+        print(f" {color}{pct:5.1f}%{Colors.NC} {path} ({covered}/{covered + len(missed)}){detail}")
+    pct = coverage_pct(total_covered, total_missed)
+    print(f" {Colors.BOLD}{pct:5.1f}% of {total_covered + total_missed} changed executable line(s) covered{Colors.NC}")
+    return pct
+
+# --- Codemods ---
+
+# A rule file is JSON: {"rules": [{"id": "...", "find": "...", "replace": "...", "regex": false,
+#   "files": ["**/*.kt"], "expect": 3, "done": "..."}]}
+# `expect` is the number of sites the rule must cover in total. Sites already rewritten only count when the rule
+# gives a `done` regex for them (so re-running a finished codemod still passes); other copies of the replacement
+# text are not evidence of anything. A rule that matches nothing fails unless it says `"expect": 0`.
+
+def load_codemod_rules(path, only=None):
+    import json
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        error(f"Could not read codemod rules from {path}: {e}")
+    rules = data["rules"] if isinstance(data, dict) else data
+    for i, rule in enumerate(rules):
+        rule.setdefault("id", f"rule-{i + 1}")
+        if "find" not in rule or "replace" not in rule:
+            error(f"Codemod rule '{rule['id']}' needs both 'find' and 'replace'.")
+        rule.setdefault("files", ["**/*.kt"])
+        if isinstance(rule["files"], str):
+            rule["files"] = [rule["files"]]
+        for key in ("find", "done") if rule.get("regex") else ("done",):
+            try:
+                if rule.get(key):
+                    re.compile(rule[key], re.MULTILINE)
+            except re.error as e:
+                error(f"Codemod rule '{rule['id']}' has an invalid '{key}' regex: {e}")
+    if only:
+        rules = [r for r in rules if r["id"] in only]
+        if not rules:
+            error(f"No rules named {', '.join(only)} in {path}.")
+    return rules
+
+def codemod_files(root, rules):
+    import fnmatch
+    suffixes = tuple({os.path.splitext(p)[1] or ".kt" for r in rules for p in r["files"]})
+    targets = {}
+    for path in iter_source_files(root, suffixes):
+        rel = path.relative_to(root).as_posix()
+        matching = [i for i, r in enumerate(rules) if any(fnmatch.fnmatch(rel, p) for p in r["files"])]
+        if matching:
+            targets[rel] = matching
+    return targets
+
+def compile_codemod_rule(rule):
+    if rule.get("regex"):
+        pattern = re.compile(rule["find"], re.MULTILINE)
+    else:
+        pattern = re.compile(re.escape(rule["find"]))
+    done = rule.get("done")
+    # Regex replacements use Python's \1 / \g<name> syntax; literal ones are inserted verbatim
+    replace = rule["replace"] if rule.get("regex") else (lambda m, text=rule["replace"]: text)
+    return pattern, replace, re.compile(done, re.MULTILINE) if done else None
+
+def apply_codemod_file(job):
+    # Runs in a worker process: rewrite one file with every rule that targets it. A rule that still matches its own
+    # output would rewrite the file again on the next run, so it is reported as not idempotent.
+    root, rel, rules = job
+    path = Path(root) / rel
+    try:
+        original = path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as e:
+        return {"path": rel, "error": str(e)}
+    content = original
+    counts, done_counts = {}, {}
+    compiled = [(rule, *compile_codemod_rule(rule)) for rule in rules]
+    for rule, pattern, replace, done in compiled:
+        if done:
+            done_counts[rule["id"]] = len(done.findall(content))
+        content, n = pattern.subn(replace, content)
+        if n:
+            counts[rule["id"]] = n
+    unstable = [rule["id"] for rule, pattern, _, _ in compiled if rule["id"] in counts and pattern.search(content)]
+    return {"path": rel, "counts": counts, "done": done_counts, "content": content if content != original else None,
+            "original": original if content != original else None, "unstable": unstable}
+
+def run_codemod(root, rules, targets, jobs):
+    from concurrent.futures import ProcessPoolExecutor
+    work = [(str(root), rel, [rules[i] for i in idx]) for rel, idx in sorted(targets.items())]
+    if jobs <= 1 or len(work) < 32:
+        return [apply_codemod_file(w) for w in work]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(apply_codemod_file, work, chunksize=max(1, len(work) // (jobs * 4))))
+
+@traced
+def handle_codemod(args):
+    import difflib
+    root = get_project_root()
+    rules = load_codemod_rules(args.rules, args.rule)
+    started = time.perf_counter()
+    targets = codemod_files(root, rules)
+    results = run_codemod(root, rules, targets, args.jobs)
+    elapsed = time.perf_counter() - started
+
+    failed = False
+    totals = {r["id"]: {"matches": 0, "files": 0, "done": 0, "unstable": 0} for r in rules}
+    for res in results:
+        if "error" in res:
+            warn(f"{res['path']}: {res['error']}")
+            failed = True
+            continue
+        for rule_id, n in res["counts"].items():
+            totals[rule_id]["matches"] += n
+            totals[rule_id]["files"] += 1
+        for rule_id, n in res["done"].items():
+            totals[rule_id]["done"] += n
+        if res["counts"]:
+            detail = ", ".join(f"{rule_id} x{n}" for rule_id, n in res["counts"].items())
+            print(f" {Colors.BLUE}{res['path']}{Colors.NC} {Colors.GRAY}{detail}{Colors.NC}")
+        for rule_id in res["unstable"]:
+            totals[rule_id]["unstable"] += 1
+        if args.diff and res["content"] is not None:
+            sys.stdout.writelines(difflib.unified_diff(res["original"].splitlines(True), res["content"].splitlines(True),
+                                                       f"a/{res['path']}", f"b/{res['path']}"))
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- CODEMOD ({len(targets)} files scanned in {elapsed * 1000:.0f} ms) ---{Colors.NC}")
+    for rule in rules:
+        t = totals[rule["id"]]
+        line = f"{t['matches']} match(es) in {t['files']} file(s)"
+        if t["unstable"]:
+            failed = True
+            line += f", {Colors.RED}still matches its own output in {t['unstable']} file(s) (not idempotent){Colors.NC}"
+            mark = f"{Colors.RED}✗"
+        elif "expect" in rule:
+            # Sites already rewritten only count once the rule has nothing left to change there
+            covered = t["matches"] + t["done"]
+            ok = covered == rule["expect"]
+            failed |= not ok
+            line += f", {covered}/{rule['expect']} expected site(s)"
+            mark = f"{Colors.GREEN}✓" if ok else f"{Colors.RED}✗"
+        elif t["matches"] or t["done"]:
+            mark = f"{Colors.GREEN}✓"
+        else:
+            failed = True
+            line += f", {Colors.RED}matched nothing (set \"expect\": 0 if that is intended){Colors.NC}"
+            mark = f"{Colors.RED}✗"
+        print(f" {mark}{Colors.NC} {rule['id']:28} {line}")
+
+    if failed:
+        error("Codemod checks failed; no files were written.")
+    changed = [res for res in results if res.get("content") is not None]
+    if not args.write:
+        log(f"Dry run: {len(changed)} file(s) would change. Re-run with --write to apply.")
+        return
+    for res in changed:
+        path = root / res["path"]
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(res["content"], encoding="utf-8")
+        os.replace(tmp, path)
+    success(f"Rewrote {len(changed)} file(s).")
+
+# --- Device Performance ---
+
+def adb_shell(*cmd):
+    res = run_command([ADB, "shell", *cmd], capture_output=True)
+    return res.stdout or "" if res.returncode == 0 else None
+
+def parse_am_start(output):
+    # `am start -W` prints key: value lines (Status, LaunchState, TotalTime, WaitTime, ...)
+    fields = {}
+    for line in output.splitlines():
+        key, sep, value = line.partition(":")
+        if sep:
+            fields[key.strip()] = value.strip()
+    return fields
+
+def parse_logcat_duration(text):
+    # "+1s234ms" / "+512ms" as printed by ActivityTaskManager
+    m = re.match(r"\+(?:(\d+)s)?(?:(\d+)ms)?", text)
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    return int(m.group(1) or 0) * 1000 + int(m.group(2) or 0)
+
+def read_launch_logcat(component):
+    out = run_command([ADB, "logcat", "-d", "-s", "ActivityTaskManager:I", "ActivityManager:I"],
+                      capture_output=True).stdout or ""
+    package, _, activity = component.partition("/")
+    names = {component, f"{package}/{activity[len(package):]}" if activity.startswith(package + ".") else component}
+    found = {}
+    for line in out.splitlines():
+        m = re.search(r"(Displayed|Fully drawn) (\S+?):? (\+\S+)", line)
+        if m:
+            # The component may be logged in its short form (pkg/.Activity)
+            if m.group(2) in names:
+                found["displayed" if m.group(1) == "Displayed" else "fully_drawn"] = parse_logcat_duration(m.group(3))
+    return found
+
+def prepare_launch(mode, package):
+    if mode == "cold":
+        adb_shell("am", "force-stop", package)
+    elif mode == "warm":
+        # Finishing the activity keeps the process (and its warmed-up runtime) but forces onCreate again
+        adb_shell("input", "keyevent", "KEYCODE_BACK")
+    elif mode == "hot":
+        adb_shell("input", "keyevent", "KEYCODE_HOME")
+
+def measure_launch(mode, package, component):
+    prepare_launch(mode, package)
+    run_command([ADB, "logcat", "-c"], capture_output=True)
+    out = adb_shell("am", "start", "-W", "-n", component)
+    if out is None:
+        return None
+    fields = parse_am_start(out)
+    if fields.get("Status", "ok") != "ok" or "TotalTime" not in fields:
+        return None
+    sample = {"total": int(fields["TotalTime"]), "wait": int(fields.get("WaitTime", fields["TotalTime"])),
+              "launch_state": fields.get("LaunchState", mode.upper())}
+    sample.update(read_launch_logcat(component))
+    return sample
+
+def percentile(values, pct):
+    import math
+    # Nearest-rank: the smallest value with at least pct% of the samples at or below it
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def summarize_samples(values):
+    import statistics
+    return {"median": statistics.median(values), "p90": percentile(values, 90), "min": min(values),
+            "max": max(values), "stdev": statistics.stdev(values) if len(values) > 1 else 0.0, "n": len(values)}
+
+def record_perf_run(kind, entry):
+    path = get_state_dir() / "perf-history.json"
+    history = load_json(path, {})
+    runs = history.get(kind, [])
+    previous = next((r for r in reversed(runs) if r["commit"] != entry["commit"] and r["device"] == entry["device"]), None)
+    # One entry per commit and device: a re-run replaces the earlier measurement of the same build
+    runs = [r for r in runs if (r["commit"], r["device"]) != (entry["commit"], entry["device"])] + [entry]
+    history[kind] = runs[-PERF_HISTORY_RUNS:]
+    save_json(path, history)
+    return previous
+
+def device_label():
+    model = (adb_shell("getprop", "ro.product.model") or "").strip() or "unknown device"
+    sdk = (adb_shell("getprop", "ro.build.version.sdk") or "").strip()
+    return f"{model} (API {sdk})" if sdk else model
+
+def handle_perf_startup(args):
+    if not check_command(ADB):
+        error(f"'{ADB}' not found. Install platform-tools or set MM_ADB.")
+    if adb_shell("echo", "ok") is None:
+        error("No device connected.")
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(modes) - {"cold", "warm", "hot"}
+    if unknown:
+        error(f"Unknown launch mode(s): {', '.join(sorted(unknown))}")
+    package = ANDROID_PACKAGE
+    component = f"{package}/{package}{ANDROID_ACTIVITY}"
+    device = device_label()
+    log(f"Measuring {args.runs} {'/'.join(modes)} launch(es) of {package} on {device}...")
+
+    results = {}
+    for mode in modes:
+        samples = []
+        # Warm and hot launches need the process up first; that priming launch is not measured
+        if mode != "cold":
+            measure_launch("cold", package, component)
+            time.sleep(args.delay)
+        with Spinner(f"{mode} launches..."):
+            for _ in range(args.runs):
+                sample = measure_launch(mode, package, component)
+                if sample:
+                    samples.append(sample)
+                time.sleep(args.delay)
+        if not samples:
+            warn(f"No successful {mode} launches (is the app installed? try 'mm build android --run').")
+            continue
+        # e.g. BACK no longer finishes the root activity on Android 12+, so a "warm" launch may really be hot;
+        # keeping those samples would compare different kinds of launch across commits
+        mismatched = [s["launch_state"] for s in samples if s["launch_state"].lower() != mode]
+        if mismatched:
+            warn(f"Dropped {len(mismatched)} {mode} launch(es) that reported LaunchState "
+                 f"{', '.join(sorted(set(mismatched)))}")
+            samples = [s for s in samples if s["launch_state"].lower() == mode]
+        if not samples:
+            continue
+        results[mode] = {metric: summarize_samples([s[metric] for s in samples if s.get(metric) is not None])
+                         for metric in ("total", "wait", "displayed", "fully_drawn")
+                         if any(s.get(metric) is not None for s in samples)}
+    if not results:
+        error("No launches could be measured.")
+
+    entry = {"commit": get_head_sha() or "unknown", "dirty": is_tree_dirty(), "device": device,
+             "recorded": time.time(), "runs": args.runs, "modes": results}
+    previous = record_perf_run("startup", entry)
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- STARTUP ({device}) ---{Colors.NC}")
+    if previous:
+        print(f" {Colors.GRAY}Compared with {previous['commit'][:7]}{Colors.NC}")
+    print(f" {Colors.BOLD}{'Launch':8} {'Metric':12} {'Median':>8} {'p90':>8} {'Min':>7} {'Max':>7} {'Stdev':>7}{Colors.NC}")
+    regressions = []
+    for mode, metrics in results.items():
+        for metric, st in metrics.items():
+            delta = ""
+            before = (previous or {}).get("modes", {}).get(mode, {}).get(metric)
+            if before and before["median"]:
+                pct = (st["median"] - before["median"]) / before["median"] * 100
+                color = Colors.RED if pct > PERF_REGRESSION_PCT else Colors.GREEN if pct < -PERF_REGRESSION_PCT else Colors.GRAY
+                delta = f" {color}{pct:+.1f}%{Colors.NC}"
+                if pct > PERF_REGRESSION_PCT and metric in ("total", "displayed"):
+                    regressions.append(f"{mode} {metric}")
+            print(f" {mode:8} {metric:12} {st['median']:6.0f}ms {st['p90']:6.0f}ms {st['min']:5.0f}ms "
+                  f"{st['max']:5.0f}ms {st['stdev']:5.0f}ms{delta}")
+    if regressions:
+        warn(f"Startup regressed more than {PERF_REGRESSION_PCT:.0f}% since {previous['commit'][:7]}: "
+             f"{', '.join(regressions)}")
+    else:
+        success("Startup measurements recorded.")
+
+def parse_gfxinfo(text):
+    # Only the first block is the per-process aggregate; later "Profile data" sections repeat per window
+    stats = {}
+    for line in text.splitlines():
+        line = line.strip()
+        m = re.match(r"Janky frames: (\d+) \(([\d.]+)%\)", line)
+        if m:
+            stats.setdefault("janky", int(m.group(1)))
+            stats.setdefault("janky_pct", float(m.group(2)))
+            continue
+        m = re.match(r"(\d+)th percentile: (\d+)ms", line)
+        if m:
+            stats.setdefault(f"p{m.group(1)}", int(m.group(2)))
+            continue
+        key, sep, value = line.partition(":")
+        if sep and key in GFXINFO_COUNTERS and value.strip().isdigit():
+            stats.setdefault(GFXINFO_COUNTERS[key], int(value.strip()))
+    return stats
+
+def handle_perf_frames(args):
+    package = ANDROID_PACKAGE
+    if args.dump:
+        path = Path(args.dump)
+        if not path.is_file():
+            error(f"Dump not found: {path}")
+        stats = parse_gfxinfo(path.read_text(errors="replace"))
+        device = None
+    else:
+        if not check_command(ADB):
+            error(f"'{ADB}' not found. Install platform-tools or set MM_ADB.")
+        if adb_shell("echo", "ok") is None:
+            error("No device connected.")
+        device = device_label()
+        if adb_shell("dumpsys", "gfxinfo", package, "reset") is None:
+            error("Could not reset frame statistics.")
+        if args.duration:
+            with Spinner(f"Recording frames for {args.duration:.0f}s - play a session on the device..."):
+                time.sleep(args.duration)
+        else:
+            log("Frame statistics reset. Play a session on the device, then press Enter.")
+            try:
+                input()
+            except EOFError:
+                pass
+        dump = adb_shell("dumpsys", "gfxinfo", package)
+        if dump is None:
+            error("Could not read frame statistics.")
+        out_dir = get_project_root() / PERF_FRAMES_DIR
+        out_dir.mkdir(parents=True, exist_ok=True)
+        path = out_dir / f"gfxinfo-{(get_head_sha() or 'unknown')[:7]}-{time.strftime('%Y%m%d-%H%M%S')}.txt"
+        path.write_text(dump)
+        stats = parse_gfxinfo(dump)
+    if not stats.get("frames"):
+        error(f"No frames recorded (is {package} in the foreground?). Raw dump: {path}")
+
+    previous = None
+    if device:
+        entry = {"commit": get_head_sha() or "unknown", "dirty": is_tree_dirty(), "device": device,
+                 "recorded": time.time(), "duration": args.duration, "stats": stats}
+        previous = record_perf_run("frames", entry)
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- FRAMES ({device or path.name}) ---{Colors.NC}")
+    if previous:
+        print(f" {Colors.GRAY}Compared with {previous['commit'][:7]}{Colors.NC}")
+    before = (previous or {}).get("stats", {})
+    regressions = []
+    rows = [("Frames", "frames", ""), ("Janky", "janky_pct", "%"), ("p50", "p50", "ms"), ("p90", "p90", "ms"),
+            ("p95", "p95", "ms"), ("p99", "p99", "ms"), ("Slow UI thread", "slow_ui_thread", ""),
+            ("Slow draw", "slow_draw", ""), ("Missed vsync", "missed_vsync", ""),
+            ("Deadline missed", "deadline_missed", "")]
+    for label, key, unit in rows:
+        if key not in stats:
+            continue
+        value = stats[key]
+        shown = f"{value:.2f}{unit}" if isinstance(value, float) else f"{value}{unit}"
+        delta = ""
+        if key in before and key != "frames":
+            if unit == "ms":
+                diff, shown_diff, worse = value - before[key], f"{value - before[key]:+d}ms", value - before[key] >= 2
+            else:
+                # Counters grow with session length, so compare them as a share of frames rendered
+                share = (lambda st: st[key]) if unit == "%" else (lambda st: st[key] / st["frames"] * 100)
+                diff = share(stats) - share(before) if before.get("frames") else 0.0
+                shown_diff, worse = f"{diff:+.2f} pts", diff >= 1
+            color = Colors.RED if worse else Colors.GREEN if diff < 0 else Colors.GRAY
+            delta = f" {color}{shown_diff}{Colors.NC}"
+            if worse:
+                regressions.append(label)
+        print(f" {label:16} {shown:>10}{delta}")
+    print(f" {Colors.GRAY}Raw dump: {path}{Colors.NC}")
+    if regressions:
+        warn(f"Frame times regressed since {previous['commit'][:7]}: {', '.join(regressions)}")
+    elif device:
+        success("Frame statistics recorded.")
+
+@traced
+def handle_perf(args):
+    if args.perf_command == "startup":
+        handle_perf_startup(args)
+    elif args.perf_command == "frames":
+        handle_perf_frames(args)
+
+# --- Artifact Size ---
+
+def format_size(n, signed=False):
+    sign = ("+" if n > 0 else "-" if n < 0 else "±") if signed else ("-" if n < 0 else "")
+    n = abs(n)
+    for unit in ("B", "KiB", "MiB"):
+        if n < 1024 or unit == "MiB":
+            return f"{sign}{n:.0f} {unit}" if unit == "B" else f"{sign}{n:.1f} {unit}"
+        n /= 1024
+
+def parse_size(text):
+    m = re.fullmatch(r"\s*([\d.]+)\s*([kKmMgG]?)(i?[bB])?\s*", text)
+    if not m:
+        raise ValueError(f"invalid size '{text}'")
+    return int(float(m.group(1)) * {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}[m.group(2).lower()])
+
+def size_category(name):
+    lower = name.lower()
+    if "composeresources/" in lower:
+        ext = os.path.splitext(lower)[1]
+        kind = {".m4a": "audio", ".mp3": "audio", ".ogg": "audio", ".wav": "audio", ".ttf": "font", ".otf": "font",
+                ".json": "data", ".xml": "strings", ".png": "images", ".webp": "images", ".jpg": "images"}
+        return f"composeResources/{kind.get(ext, 'other')}"
+    if re.fullmatch(r"classes\d*\.dex", lower):
+        return "dex"
+    if lower.endswith(".class"):
+        return "classes"
+    if lower.startswith("lib/") or lower.endswith((".so", ".dylib", ".dll", ".jnilib")):
+        return "native"
+    if lower == "resources.arsc" or lower.startswith("res/"):
+        return "resources"
+    if lower.startswith("assets/"):
+        return "assets"
+    if lower.startswith("meta-inf/"):
+        return "META-INF"
+    return "other"
+
+def find_artifact(root, target):
+    candidates = [p for pattern in SIZE_ARTIFACTS[target] for p in root.glob(pattern)]
+    return max(candidates, key=lambda p: p.stat().st_mtime) if candidates else None
+
+def analyze_artifact(path):
+    # Reads only the zip central directory: sizes come from the entry headers, nothing is extracted
+    import zipfile
+    categories, entries, warnings = {}, {}, []
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            cat = categories.setdefault(size_category(info.filename), {"download": 0, "uncompressed": 0, "count": 0})
+            cat["download"] += info.compress_size
+            cat["uncompressed"] += info.file_size
+            cat["count"] += 1
+            entries[info.filename] = info.compress_size
+            stored = info.compress_type == zipfile.ZIP_STORED
+            # Both are mmapped straight out of the APK at startup; compressing them costs install and cold-start I/O
+            if path.suffix == ".apk" and not stored and (info.filename == "resources.arsc" or
+                                                         info.filename.endswith(".so")):
+                warnings.append(f"{info.filename} is compressed; store it uncompressed so it can be mmapped")
+    return {"file_size": path.stat().st_size, "categories": categories, "entries": entries, "warnings": warnings}
+
+def print_size_report(snapshot, previous):
+    prev_cats = previous["categories"] if previous else {}
+    print(f" {Colors.BOLD}{'Category':28} {'Download':>11} {'Uncompressed':>13} {'Files':>6} {'Δ download':>12}{Colors.NC}")
+    for name, cat in sorted(snapshot["categories"].items(), key=lambda kv: -kv[1]["download"]):
+        delta = ""
+        if previous:
+            diff = cat["download"] - prev_cats.get(name, {}).get("download", 0)
+            color = Colors.RED if diff > 0 else Colors.GREEN if diff < 0 else Colors.GRAY
+            delta = f"{color}{format_size(diff, signed=True):>12}{Colors.NC}"
+        print(f" {name:28} {format_size(cat['download']):>11} {format_size(cat['uncompressed']):>13} "
+              f"{cat['count']:>6} {delta}")
+    for name in sorted(set(prev_cats) - set(snapshot["categories"])):
+        print(f" {Colors.GRAY}{name:28} {'-':>11} {'-':>13} {0:>6}{Colors.NC} "
+              f"{Colors.GREEN}{format_size(-prev_cats[name]['download'], signed=True):>12}{Colors.NC}")
+    total = sum(c["uncompressed"] for c in snapshot["categories"].values())
+    print(f" {Colors.BOLD}{'Total':28} {format_size(snapshot['file_size']):>11} {format_size(total):>13}{Colors.NC}")
+
+    if previous:
+        prev_entries = previous.get("entries", {})
+        changes = [(name, snapshot["entries"].get(name, 0) - prev_entries.get(name, 0))
+                   for name in set(snapshot["entries"]) | set(prev_entries)]
+        changes = sorted((c for c in changes if c[1]), key=lambda c: -abs(c[1]))[:10]
+        if changes:
+            print(f"\n {Colors.BOLD}Largest changes since {previous['commit'][:7]}:{Colors.NC}")
+            for name, diff in changes:
+                color = Colors.RED if diff > 0 else Colors.GREEN
+                print(f"  {color}{format_size(diff, signed=True):>12}{Colors.NC} {name}")
+    for w in snapshot["warnings"]:
+        warn(w)
+
+def check_artifact_size(target, artifact=None, budget=None, max_growth_pct=None):
+    root = get_project_root()
+    path = Path(artifact) if artifact else find_artifact(root, target)
+    if not path or not path.exists():
+        error(f"No {target} artifact found. Build it first (mm build {target}).")
+    snapshot = analyze_artifact(path)
+    # Only entries big enough to matter are kept for per-file diffs, so the history stays small
+    snapshot["entries"] = {name: size for name, size in snapshot["entries"].items() if size >= 4096}
+    snapshot.update(target=target, artifact=str(path.relative_to(root)) if path.is_relative_to(root) else str(path),
+                    commit=get_head_sha() or "unknown", dirty=is_tree_dirty(), recorded=time.time())
+
+    history_path = get_state_dir() / "size-history.json"
+    history = load_json(history_path, [])
+    same_artifact = [h for h in history if h["target"] == target and h["artifact"] == snapshot["artifact"]]
+    # One snapshot per commit: rebuilding a commit replaces its entry, and the diff (and growth budget) is always
+    # against the last build of an earlier commit, so re-running a failed check cannot wave a regression through
+    previous = next((h for h in reversed(same_artifact) if h["commit"] != snapshot["commit"]), None)
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- SIZE: {path.name} ({target}) ---{Colors.NC}")
+    if previous:
+        print(f" {Colors.GRAY}Compared with the build of {previous['commit'][:7]}"
+              f"{' (dirty)' if previous['dirty'] else ''}{Colors.NC}")
+    print_size_report(snapshot, previous)
+    history = [h for h in history if h not in same_artifact or h["commit"] != snapshot["commit"]] + [snapshot]
+    save_json(history_path, history[-SIZE_HISTORY_RUNS:])
+
+    budget = budget if budget is not None else SIZE_BUDGET_BYTES.get(target)
+    max_growth_pct = SIZE_GROWTH_BUDGET_PCT if max_growth_pct is None else max_growth_pct
+    if budget and snapshot["file_size"] > budget:
+        error(f"{path.name} is {format_size(snapshot['file_size'])}, over the {format_size(budget)} budget.")
+    if previous and previous["file_size"]:
+        growth = (snapshot["file_size"] - previous["file_size"]) / previous["file_size"] * 100
+        if growth > max_growth_pct:
+            error(f"{path.name} grew {growth:.1f}% since {previous['commit'][:7]} "
+                  f"(budget {max_growth_pct:.1f}%).")
+    success(f"{path.name}: {format_size(snapshot['file_size'])} download size.")
+
+@traced
+def handle_size(args):
+    budget = None
+    if args.budget:
+        try:
+            budget = parse_size(args.budget)
+        except ValueError as e:
+            error(str(e))
+    check_artifact_size(args.target, args.artifact, budget, args.max_growth)
+
+# --- Database Lab ---
+
+def find_room_schemas(root):
+    # Room exports one JSON per database version; the newest version of each database is what ships
+    latest = {}
+    for path in root.glob("*/**/schemas/*/*.json"):
+        if "build" in path.parts or not path.stem.isdigit():
+            continue
+        db = path.parent.name
+        if db not in latest or int(path.stem) > int(latest[db].stem):
+            latest[db] = path
+    return sorted(latest.values())
+
+def read_kotlin_enums(root):
+    enums = {}
+    for path in iter_source_files(root, ".kt"):
+        text = path.read_text(encoding="utf-8")
+        for name, body in re.findall(r"enum class (\w+)\s*(?:\([^)]*\))?\s*\{([^;}]*)", text):
+            values = re.findall(r"^\s*([A-Z][A-Z0-9_]*)\b", body, re.MULTILINE)
+            if values:
+                enums[name] = values
+    return enums
+
+def db_value_factory(column, affinity, enums, rng, row_count):
+    # Realistic-enough values for the columns our DAOs filter and sort on; anything else gets affinity-based noise
+    name = column.lower()
+    now_ms = int(time.time() * 1000)
+    enum_values = enums.get(column[:1].upper() + column[1:])
+    if enum_values and affinity == "TEXT":
+        return lambda i: rng.choice(enum_values)
+    if name == "paircount":
+        return lambda i: rng.choice((6, 8, 10, 12))
+    if name == "timestamp":
+        return lambda i: now_ms - rng.randrange(730 * 86_400_000)
+    if name == "date":
+        today = int(time.time() // 86_400)
+        return lambda i: today - i
+    if name in ("score", "bestscore", "balance"):
+        return lambda i: int(rng.expovariate(1 / 2500))
+    if "seconds" in name:
+        return lambda i: rng.randint(15, 900)
+    if name == "moves":
+        return lambda i: rng.randint(6, 250)
+    if name.startswith(("is", "are", "has")):
+        return lambda i: rng.random() < 0.5
+    if affinity == "INTEGER":
+        return lambda i: rng.randrange(1_000_000)
+    if affinity == "REAL":
+        return lambda i: rng.random()
+    if "state" in name:
+        # Serialized game state blobs are a few KB in practice
+        return lambda i: "x" * rng.randint(1024, 4096)
+    return lambda i: f"{column}-{rng.randrange(row_count * 10 or 1)}"
+
+def create_lab_database(db_path, schema, rows, enums, seed):
+    import random
+    import sqlite3
+    db_path.unlink(missing_ok=True)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    rng = random.Random(seed)
+    counts = {}
+    conn.execute("BEGIN")
+    for entity in schema["entities"]:
+        table = entity["tableName"]
+        conn.execute(entity["createSql"].replace("${TABLE_NAME}", table))
+        for index in entity.get("indices", []):
+            conn.execute(index["createSql"].replace("${TABLE_NAME}", table))
+        count = rows.get(table, DB_DEFAULT_ROWS)
+        pk = entity["primaryKey"]
+        columns, factories = [], []
+        for field in entity["fields"]:
+            column = field["columnName"]
+            if pk["autoGenerate"] and pk["columnNames"] == [column]:
+                continue
+            columns.append(column)
+            if pk["columnNames"] == [column] and column != "date":
+                # Sequential keys keep single-row tables (id = 0) addressable and never collide
+                factories.append(lambda i: i)
+            else:
+                factories.append(db_value_factory(column, field["affinity"], enums, rng, count))
+        sql = f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in columns)}) VALUES ({', '.join('?' * len(columns))})"
+        conn.executemany(sql, ([f(i) for f in factories] for i in range(count)))
+        counts[table] = count
+    for query in schema.get("setupQueries", []):
+        conn.execute(query)
+    conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+    conn.close()
+    return counts
+
+def extract_dao_queries(root):
+    # Pulls @Query SQL out of the DAOs by concatenating the annotation's string literals, string-aware so that
+    # parentheses inside SQL (ROW_NUMBER() OVER(...)) don't end the annotation early
+    queries = []
+    for path in iter_source_files(root, "Dao.kt"):
+        text = path.read_text(encoding="utf-8")
+        dao = path.stem
+        for m in re.finditer(r"@Query\(", text):
+            i, depth, parts, literal = m.end(), 1, [], None
+            while i < len(text) and depth:
+                ch = text[i]
+                if literal is not None:
+                    if ch == "\\":
+                        literal.append(text[i + 1])
+                        i += 1
+                    elif ch == '"':
+                        parts.append("".join(literal))
+                        literal = None
+                    else:
+                        literal.append(ch)
+                elif ch == '"':
+                    literal = []
+                elif ch == "(":
+                    depth += 1
+                elif ch == ")":
+                    depth -= 1
+                i += 1
+            fn = re.search(r"fun\s+(\w+)\s*\(", text[i:])
+            queries.append({"name": f"{dao}.{fn.group(1) if fn else '?'}", "sql": "".join(parts),
+                            "path": str(path.relative_to(root))})
+    return queries
+
+def sample_query_params(conn, sql):
+    # Binds each :param to a value that really occurs in the column it is compared against
+    params = {}
+    table = re.search(r"\bFROM\s+`?(\w+)", sql, re.IGNORECASE)
+    for column, param in re.findall(r"`?(\w+)`?\s*=\s*:(\w+)", sql):
+        try:
+            row = conn.execute(f"SELECT `{column}` FROM `{table.group(1)}` LIMIT 1 OFFSET "
+                               f"(SELECT COUNT(*) FROM `{table.group(1)}`) / 2").fetchone()
+        except Exception:
+            row = None
+        params[param] = row[0] if row else 0
+    for param in re.findall(r":(\w+)", sql):
+        params.setdefault(param, 0)
+    return params
+
+def time_query(conn, sql, params, repeat):
+    import statistics
+    samples, rows = [], 0
+    is_select = sql.lstrip().upper().startswith(("SELECT", "WITH"))
+    for _ in range(repeat):
+        # Slow queries already show their cost after a few runs; don't spend minutes re-proving it
+        if len(samples) >= 3 and sum(samples) > 1000:
+            break
+        if not is_select:
+            # Writes are timed inside a transaction that is rolled back, so the data set stays fixed
+            conn.execute("BEGIN")
+        started = time.perf_counter()
+        cur = conn.execute(sql, params)
+        rows = len(cur.fetchall()) if is_select else cur.rowcount
+        samples.append((time.perf_counter() - started) * 1000)
+        if not is_select:
+            conn.execute("ROLLBACK")
+    return statistics.median(samples), rows
+
+def query_plan_issues(conn, sql, params):
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    issues = []
+    for detail in plan:
+        if re.match(r"SCAN (?!.*USING (COVERING )?INDEX)\w+$", detail) and not detail.startswith("SCAN CONSTANT"):
+            issues.append(f"full table scan ({detail})")
+        elif "TEMP B-TREE" in detail:
+            issues.append(detail.lower())
+    return plan, issues
+
+def suggest_index(sql):
+    table = re.search(r"\bFROM\s+`?(\w+)`?", sql, re.IGNORECASE)
+    if not table:
+        return None
+    equality = re.findall(r"`?(\w+)`?\s*=\s*:\w+", sql)
+    order = re.search(r"ORDER BY\s+(.+?)(?:\s+LIMIT\b|\)|$)", sql, re.IGNORECASE)
+    partition = re.search(r"PARTITION BY\s+(.+?)\s+ORDER BY", sql, re.IGNORECASE)
+    columns = list(dict.fromkeys(equality))
+    if partition:
+        columns += [c.strip() for c in partition.group(1).split(",") if c.strip() not in columns]
+    if order:
+        columns += [c.strip() for c in order.group(1).split(",") if c.split()[0] not in columns]
+    if not columns:
+        return None
+    name = "index_{}_{}".format(table.group(1), "_".join(c.split()[0] for c in columns))
+    return f"CREATE INDEX `{name}` ON `{table.group(1)}` ({', '.join(columns)})"
+
+@traced
+def handle_db(args):
+    import sqlite3
+    root = get_project_root()
+    schemas = [Path(args.schema)] if args.schema else find_room_schemas(root)
+    if not schemas:
+        error("No exported Room schemas found (expected <module>/schemas/<Database>/<version>.json).")
+    rows = dict(DB_LARGE_TABLE_ROWS)
+    for spec in args.rows or []:
+        table, _, count = spec.partition("=")
+        if not count.isdigit():
+            error(f"Invalid --rows '{spec}'; expected TABLE=COUNT.")
+        rows[table] = int(count)
+
+    queries = extract_dao_queries(root)
+    enums = None
+    out_dir = root / "build" / "mm-db"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for schema_path in schemas:
+        schema = load_json(schema_path, None)
+        if not schema:
+            error(f"Could not read {schema_path}.")
+        schema = schema["database"]
+        db_name = schema_path.parent.name.rsplit(".", 1)[-1]
+        db_path = out_dir / f"{db_name}-v{schema['version']}.sqlite"
+        signature = {"identity": schema["identityHash"], "rows": rows, "seed": args.seed}
+        meta_path = db_path.with_suffix(".json")
+        if args.fresh or not db_path.exists() or load_json(meta_path, None) != signature:
+            enums = enums if enums is not None else read_kotlin_enums(root)
+            started = time.perf_counter()
+            with Spinner(f"Generating {db_name} v{schema['version']} with synthetic rows..."):
+                counts = create_lab_database(db_path, schema, rows, enums, args.seed)
+            save_json(meta_path, signature)
+            log(f"Generated {db_path.relative_to(root)} in {time.perf_counter() - started:.1f}s: "
+                f"{', '.join(f'{t}={n:,}' for t, n in counts.items())}")
+        else:
+            log(f"Reusing {db_path.relative_to(root)} (same schema and scale; --fresh to regenerate)")
+
+        tables = {e["tableName"] for e in schema["entities"]}
+        db_queries = [q for q in queries if (m := re.search(r"\bFROM\s+`?(\w+)", q["sql"], re.IGNORECASE))
+                      and m.group(1) in tables]
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        print(f"\n{Colors.CYAN}{Colors.BOLD}--- {db_name} v{schema['version']} QUERIES ---{Colors.NC}")
+        suggestions = {}
+        for q in db_queries:
+            params = sample_query_params(conn, q["sql"])
+            try:
+                median_ms, count = time_query(conn, q["sql"], params, args.repeat)
+                plan, issues = query_plan_issues(conn, q["sql"], params)
+            except sqlite3.Error as e:
+                print(f" {Colors.YELLOW}?{Colors.NC} {q['name']:44} {Colors.YELLOW}{e}{Colors.NC}")
+                continue
+            color = Colors.RED if issues and median_ms >= 1 else Colors.YELLOW if issues else Colors.GREEN
+            print(f" {color}{median_ms:9.3f} ms{Colors.NC} {q['name']:44} {Colors.GRAY}{count} row(s){Colors.NC}")
+            if args.verbose:
+                for detail in plan:
+                    print(f"     {Colors.GRAY}{detail}{Colors.NC}")
+            for issue in issues:
+                print(f"     {Colors.YELLOW}⚠ {issue}{Colors.NC}")
+            if issues:
+                index = suggest_index(q["sql"])
+                if index:
+                    suggestions.setdefault(index, []).append((q, params, median_ms))
+                    print(f"     {Colors.BLUE}→ {index}{Colors.NC}")
+
+        if suggestions and args.try_indexes:
+            print(f"\n{Colors.CYAN}{Colors.BOLD}--- WITH SUGGESTED INDEXES ---{Colors.NC}")
+            for index in suggestions:
+                conn.execute(index)
+            conn.execute("ANALYZE")
+            for index, affected in suggestions.items():
+                for q, params, before in affected:
+                    after, _ = time_query(conn, q["sql"], params, args.repeat)
+                    _, issues = query_plan_issues(conn, q["sql"], params)
+                    remaining = f" {Colors.YELLOW}(still: {'; '.join(issues)}){Colors.NC}" if issues else ""
+                    color = Colors.GREEN if after < before * 0.8 else Colors.YELLOW
+                    print(f" {q['name']:44} {before:9.3f} ms → {color}{after:9.3f} ms{Colors.NC}{remaining}")
+            for index in suggestions:
+                conn.execute(f"DROP INDEX {index.split()[2]}")
+        conn.close()
+
+# --- Worktree Warming ---
+
+def warm_status_path(worktree):
+    return Path(worktree) / STATE_DIR / "warm-status.json"
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def read_warm_status(worktree):
+    status = load_json(warm_status_path(worktree), None)
+    if status and status["state"] == "running" and status["pid"] and not process_alive(status["pid"]):
+        status["state"] = "interrupted"
+    return status
+
+def format_warm_status(status):
+    if not status:
+        return ""
+    if status["state"] == "running":
+        elapsed = time.time() - status["started"]
+        return f" {Colors.CYAN}warming: {status['step']} ({elapsed:.0f}s){Colors.NC}"
+    if status["state"] == "done":
+        return f" {Colors.GREEN}warm ({status['finished'] - status['started']:.0f}s){Colors.NC}"
+    return f" {Colors.RED}warm-up {status['state']} during {status['step']} (see {STATE_DIR}/warm.log){Colors.NC}"
+
+def start_warm_worker(target_dir, source):
+    import subprocess
+    get_state_dir(target_dir)
+    # Written before the spawn so the worker (which takes over the file) never races this initial state
+    save_json(warm_status_path(target_dir), {"state": "running", "step": "starting", "pid": None,
+                                             "started": time.time(), "finished": None})
+    with open(target_dir / STATE_DIR / "warm.log", "w") as log_file:
+        # A new session keeps the worker (and its Gradle client) alive after this shell exits or gets ^C
+        proc = subprocess.Popen([sys.executable, str(Path(__file__).resolve().with_name("mm.py")), "--no-banner", "task", "warm",
+                                 target_dir.name, "--foreground", "--from", str(source)],
+                                stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT,
+                                start_new_session=True)
+    return proc.pid
+
+def stop_warm_worker(target_dir):
+    import signal
+    status = read_warm_status(target_dir)
+    if not status or status["state"] != "running" or not status["pid"]:
+        return False
+    try:
+        os.killpg(status["pid"], signal.SIGTERM)
+    except ProcessLookupError:
+        return False
+    return True
+
+def supports_clones(src_dir, dst_dir):
+    import tempfile
+    # `cp --reflink=auto` quietly falls back to a byte-for-byte copy (ext4, or across filesystems), and a full copy
+    # of every build directory costs more time and disk than the build it would save
+    flag = "-c" if sys.platform == "darwin" else "--reflink=always"
+    with tempfile.NamedTemporaryFile(dir=src_dir, prefix=".mm-clone-probe-") as probe:
+        target = dst_dir / Path(probe.name).name
+        res = run_command(["cp", flag, probe.name, str(target)], capture_output=True)
+        target.unlink(missing_ok=True)
+    return res.returncode == 0
+
+def clone_tree(src, dst):
+    # Copy-on-write clones only: hardlinks would let Gradle's in-place writes (Kotlin IC caches, lock files) in one
+    # worktree corrupt the other.
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    cmd = ["cp", "-Rc", str(src), str(dst)] if sys.platform == "darwin" else \
+          ["cp", "-a", "--reflink=always", str(src), str(dst)]
+    return run_command(cmd, capture_output=True).returncode == 0
+
+def seed_build_state(target_dir, source):
+    import shutil
+    if not supports_clones(source, target_dir):
+        log(f"No copy-on-write clones from {source} to {target_dir}; not seeding build state (a full copy would "
+            "cost more than the build it saves).")
+        return 0
+    dirs = [graph["dir"] + "/build" for graph in read_module_graph(source).values()] + [".gradle"]
+    seeded = 0
+    for rel in dirs:
+        src, dst = source / rel, target_dir / rel
+        if not src.is_dir() or dst.exists():
+            continue
+        if clone_tree(src, dst):
+            seeded += 1
+        else:
+            warn(f"Could not seed {rel}; it will be built from scratch.")
+            shutil.rmtree(dst, ignore_errors=True)
+    # Configuration cache entries are keyed by the absolute root path, so the source's entries can never hit here
+    shutil.rmtree(target_dir / ".gradle" / "configuration-cache", ignore_errors=True)
+    return seeded
+
+def warm_worktree(target_dir, source):
+    status_path = warm_status_path(target_dir)
+    status = load_json(status_path, None) or {"started": time.time()}
+    status.update(state="running", pid=os.getpid(), finished=None)
+
+    def update(**fields):
+        status.update(fields)
+        save_json(status_path, status)
+
+    update(step="seeding build state")
+    if source.resolve() != target_dir.resolve():
+        seeded = seed_build_state(target_dir, source)
+        if seeded:
+                log(f"Seeded {seeded} build director{'y' if seeded == 1 else 'ies'} from {source}")
+    for step, tasks in WARM_STEPS:
+        update(step=step)
+        log(f"Warm-up: {step} ({' '.join(tasks)})")
+        res = run_gradle(tasks, cwd=target_dir, capture_output=True, show_spinner=False)
+        print(res.stdout or "", res.stderr or "", sep="", flush=True)
+        if res.returncode != 0:
+            update(state="failed", finished=time.time())
+            warn(f"Warm-up step '{step}' failed.")
+            return False
+    update(state="done", step="done", finished=time.time())
+    success(f"Worktree warmed in {status['finished'] - status['started']:.0f}s")
+    return True
+
+# --- Build Cache Server ---
+
+BUILD_CACHE_KEY_RE = re.compile(r"^[0-9a-fA-F]{16,128}$")
+
+def build_cache_init_script(port):
+    return f"""// Generated by mm.py (`mm cache serve`): share build outputs between worktrees
+beforeSettings {{
+    buildCache {{
+        remote(HttpBuildCache::class.java) {{
+            url = java.net.URI("http://127.0.0.1:{port}/cache/")
+            isAllowInsecureProtocol = true
+            isPush = true
+        }}
+    }}
+}}
+"""
+
+def wire_build_cache(root, script):
+    init_dir = get_state_dir(root) / "init.d"
+    init_dir.mkdir(exist_ok=True)
+    path = init_dir / BUILD_CACHE_INIT_SCRIPT
+    if not path.exists() or path.read_text() != script:
+        path.write_text(script)
+
+class BuildCacheStore:
+    # Entries live as flat files named by cache key; access order is kept in memory and mirrored to mtime,
+    # so LRU order survives a restart.
+    def __init__(self, root, max_bytes):
+        import threading
+        from collections import OrderedDict
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.total = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_served": 0, "bytes_stored": 0}
+        root.mkdir(parents=True, exist_ok=True)
+        files = []
+        for entry in os.scandir(root):
+            if entry.is_file() and BUILD_CACHE_KEY_RE.match(entry.name):
+                st = entry.stat()
+                files.append((st.st_mtime, entry.name, st.st_size))
+            elif entry.name.endswith(".tmp"):
+                os.unlink(entry.path)
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.total += size
+        self._evict()
+
+    def open(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.stats["misses"] += 1
+                return None, 0
+            self.entries.move_to_end(key)
+            size = self.entries[key]
+            self.stats["hits"] += 1
+            self.stats["bytes_served"] += size
+        path = self.root / key
+        try:
+            os.utime(path)
+            return open(path, "rb"), size
+        except FileNotFoundError:
+            return None, 0
+
+    def store(self, key, stream, length):
+        tmp = self.root / f"{key}.{os.getpid()}.{id(stream)}.tmp"
+        remaining = length
+        with open(tmp, "wb") as f:
+            while remaining > 0:
+                chunk = stream.read(min(1 << 16, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+        if remaining:
+            tmp.unlink(missing_ok=True)
+            return False
+        os.replace(tmp, self.root / key)
+        with self.lock:
+            self.total += length - self.entries.pop(key, 0)
+            self.entries[key] = length
+            self.stats["stores"] += 1
+            self.stats["bytes_stored"] += length
+            self._evict()
+        return True
+
+    def _evict(self):
+        while self.total > self.max_bytes and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.total -= size
+            self.stats["evictions"] += 1
+            (self.root / key).unlink(missing_ok=True)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), bytes=self.total, max_bytes=self.max_bytes)
+
+def make_build_cache_handler(store):
+    import json
+    import shutil
+    from http.server import BaseHTTPRequestHandler
+
+    class BuildCacheHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 keeps Gradle's pooled connections alive and answers `Expect: 100-continue` for us
+        protocol_version = "HTTP/1.1"
+
+        def _key(self):
+            prefix = "/cache/"
+            key = self.path[len(prefix):] if self.path.startswith(prefix) else ""
+            return key if BUILD_CACHE_KEY_RE.match(key) else None
+
+        def _reply(self, code, body=b"", content_type="application/octet-stream"):
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                return self._reply(200, json.dumps(store.snapshot()).encode(), "application/json")
+            key = self._key()
+            if not key:
+                return self._reply(400)
+            f, size = store.open(key)
+            if not f:
+                return self._reply(404)
+            with f:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(size))
+                self.end_headers()
+                shutil.copyfileobj(f, self.wfile)
+
+        def do_PUT(self):
+            key = self._key()
+            length = int(self.headers.get("Content-Length") or -1)
+            if not key or length < 0:
+                return self._reply(400)
+            if length > store.max_bytes:
+                # Gradle treats 413 as "entry too large" and carries on without failing the build
+                self.rfile.read(length)
+                return self._reply(413)
+            self._reply(201 if store.store(key, self.rfile, length) else 400)
+
+        def log_message(self, format, *args):
+            pass
+
+    return BuildCacheHandler
+
+def print_build_cache_stats(stats):
+    lookups = stats["hits"] + stats["misses"]
+    rate = f"{stats['hits'] / lookups * 100:.0f}%" if lookups else "n/a"
+    print(f" {Colors.BOLD}Entries:{Colors.NC} {stats['entries']} ({stats['bytes'] / 1024 ** 2:.1f} MiB of "
+          f"{stats['max_bytes'] / 1024 ** 3:.1f} GiB)")
+    print(f" {Colors.BOLD}Lookups:{Colors.NC} {stats['hits']} hits, {stats['misses']} misses ({rate} hit rate)")
+    print(f" {Colors.BOLD}Traffic:{Colors.NC} {stats['bytes_served'] / 1024 ** 2:.1f} MiB served, "
+          f"{stats['bytes_stored'] / 1024 ** 2:.1f} MiB stored in {stats['stores']} entries, {stats['evictions']} evicted")
+
+@traced
+def handle_cache(args):
+    if args.cache_command == "stats":
+        import json
+        import urllib.request
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{args.port}/stats", timeout=2) as res:
+                stats = json.load(res)
+        except OSError:
+            error(f"No build cache server on port {args.port}. Start one with 'mm cache serve'.")
+        print_build_cache_stats(stats)
+        return
+
+    worktree_roots = [Path(wt["path"]) for wt in get_git_snapshot()["worktrees"] if Path(wt["path"]).is_dir()]
+    if args.cache_command == "unwire":
+        for root in worktree_roots:
+            (root / STATE_DIR / "init.d" / BUILD_CACHE_INIT_SCRIPT).unlink(missing_ok=True)
+        success(f"Removed the build cache init script from {len(worktree_roots)} worktree(s).")
+        return
+
+    from http.server import ThreadingHTTPServer
+    store = BuildCacheStore(Path(os.path.expanduser(args.dir)), int(args.max_size * 1024 ** 3))
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", args.port), make_build_cache_handler(store))
+    except OSError as e:
+        error(f"Cannot listen on port {args.port}: {e}")
+    server.daemon_threads = True
+    if not args.no_wire:
+        script = build_cache_init_script(args.port)
+        for root in worktree_roots:
+            wire_build_cache(root, script)
+        log(f"Wired {len(worktree_roots)} worktree(s); new 'mm task new' worktrees are wired automatically.")
+    success(f"Build cache listening on http://127.0.0.1:{args.port}/cache/ ({store.root})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- BUILD CACHE SESSION ---{Colors.NC}")
+    print_build_cache_stats(store.snapshot())
+
+# --- Traces ---
+
+@traced
+def handle_trace(args):
+    trace_dir = get_project_root() / TRACE_DIR
+    traces = sorted(trace_dir.glob("mm-*.json"), key=lambda p: p.stat().st_mtime) if trace_dir.exists() else []
+    if not traces:
+        error(f"No traces recorded yet in {trace_dir}.")
+    path = traces[-1]
+    events = [e for e in load_json(path, {}).get("traceEvents", []) if e.get("ph") == "X"]
+    if not events:
+        error(f"Trace {path.name} contains no spans.")
+    start = min(e["ts"] for e in events)
+    total = max(e["ts"] + e["dur"] for e in events) - start
+
+    print(f"\n{Colors.CYAN}{Colors.BOLD}--- {path.name} ({total / 1000:.0f} ms) ---{Colors.NC}")
+    for e in sorted(events, key=lambda e: e["dur"], reverse=True)[:args.top]:
+        code = e["args"].get("exit_code")
+        status = "" if code in (None, 0) else f" {Colors.RED}exit {code}{Colors.NC}"
+        share = e["dur"] / total * 100 if total else 0
+        print(f" {e['dur'] / 1000:9.1f} ms {Colors.GRAY}{share:5.1f}%{Colors.NC} "
+              f"{Colors.BLUE}{e['cat']:10}{Colors.NC} {e['name'][:70]}{status}")
+    log(f"Open in Perfetto: https://ui.perfetto.dev (file: {path})")
+
+# --- Main ---
+
+# Each command only gets its arguments wired up when it is the one being invoked (or help is requested),
+# so `mm task locate` does not pay for building the whole argparse tree.
+
+def add_build_args(build_p):
+    build_p.add_argument("target", choices=BUILD_TARGETS + ["all"],
+                         help="Target platform; 'all' or several targets build together in one Gradle invocation")
+    build_p.add_argument("--run", action="store_true", help="Launch the app after build")
+    build_p.add_argument("--release", action="store_true", help="Build in release mode")
+    build_p.add_argument("--clean", action="store_true", help="Run clean before build")
+    build_p.add_argument("--log", action="store_true", help="Stream logs (Android only)")
+    build_p.add_argument("--profile", action="store_true", help="Profile the Gradle build and record task timings")
+    build_p.add_argument("--size", action="store_true",
+                         help="Record the artifact size breakdown and fail if it exceeds the size budget")
+    add_logcat_args(build_p)
+    build_p.add_argument("params", nargs="*", help="Extra Gradle parameters")
+
+def add_logcat_args(sub_p):
+    sub_p.add_argument("--filter", help="Filter logs by tag (Android only)")
+    sub_p.add_argument("--include", action="append", metavar="REGEX", help="Only show lines matching REGEX (repeatable)")
+    sub_p.add_argument("--exclude", action="append", metavar="REGEX", help="Hide lines matching REGEX (repeatable)")
+    sub_p.add_argument("--buffer", type=int, default=LOGCAT_BUFFER_LINES,
+                       help=f"Lines kept for crash/ANR dumps (default: {LOGCAT_BUFFER_LINES})")
+
+def add_test_args(test_p):
+    test_p.add_argument("module", choices=["all", "shared", "android", "desktop", "report"], default="all", nargs="?",
+                        help="Module to test (default: all), or 'report' to summarize the latest results")
+    test_p.add_argument("--changed", action="store_true",
+                        help="Only test modules changed against --base, plus the modules that depend on them")
+    test_p.add_argument("--base", default="main", help="Base ref for --changed (default: main)")
+    test_p.add_argument("--profile", action="store_true", help="Profile the Gradle build and record task timings")
+    test_p.add_argument("--shards", type=int, metavar="N",
+                        help="Split JVM test classes into N parallel Gradle processes, balanced by past durations")
+    test_p.add_argument("--quarantine", choices=["exclude", "retry", "include"], default="exclude",
+                        help="How to treat quarantined tests (default: exclude)")
+    report = test_p.add_argument_group("report options")
+    report.add_argument("--top", type=int, default=TEST_REPORT_TOP, help="Slowest tests/classes to list (default: 10)")
+    report.add_argument("--quarantine-flaky", dest="quarantine_flaky", action="store_true",
+                        help="Add the flaky tests to the quarantine list")
+    report.add_argument("--release", action="append", metavar="CLASS#NAME", help="Remove a test from the quarantine")
+
+def add_task_args(task_p):
+    task_sub = task_p.add_subparsers(dest="subcommand", required=True)
+    
+    new_p = task_sub.add_parser("new", help="Create a new workspace for a feature or fix")
+    new_p.add_argument("type", choices=TASK_TYPES, help="Task category")
+    new_p.add_argument("name", help="Task name (used for branch and directory)")
+    new_p.add_argument("--warm", action="store_true",
+                       help="Seed build state and prime the daemon/configuration cache in the background")
+    
+    task_sub.add_parser("list", help="List all active task workspaces")
+    
+    locate_p = task_sub.add_parser("locate", help="Find the absolute path of a workspace")
+    locate_p.add_argument("name", help="Task name to locate")
+    
+    warm_p = task_sub.add_parser("warm", help="Prime an existing workspace so its first build starts warm")
+    warm_p.add_argument("name", help="Task name to warm")
+    warm_p.add_argument("--from", dest="source", help="Worktree to seed build state from (default: main worktree)")
+    warm_p.add_argument("--foreground", action="store_true", help="Run in this process instead of in the background")
+
+    task_sub.add_parser("clean", help="Remove metadata for orphaned worktrees")
+    
+    remove_p = task_sub.add_parser("remove", help="Safely delete a workspace and its branch")
+    remove_p.add_argument("name", nargs="?", help="Task name to remove (interactive if omitted)")
+    remove_p.add_argument("--merged", action="store_true", help="Remove every worktree whose branch is merged into --base")
+    remove_p.add_argument("--base", default="main", help="Branch to check merges against (default: main)")
+    remove_p.add_argument("--dry-run", action="store_true", help="Only list what --merged would remove")
+    remove_p.add_argument("-y", "--yes", action="store_true", help="Do not ask for confirmation")
+
+def add_lint_args(lint_p):
+    lint_p.add_argument("--fix", action="store_true", help="Automatically fix style issues")
+
+def add_open_args(open_p):
+    open_p.add_argument("target", choices=["android", "ios"], help="Target IDE (Android Studio or Xcode)")
+
+def add_coverage_args(cov_p):
+    cov_p.add_argument("--open", action="store_true", help="Open HTML report in browser")
+    cov_p.add_argument("--html", action="store_true", help="Also generate the HTML report")
+    cov_p.add_argument("--diff", nargs="?", const=COVERAGE_BASE_REF, metavar="BASE",
+                       help=f"Report coverage of lines changed against BASE (default: {COVERAGE_BASE_REF})")
+    cov_p.add_argument("--fail-under", type=float, metavar="PCT", help="Exit non-zero if diff coverage is below PCT")
+    cov_p.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline for deltas")
+    cov_p.add_argument("--no-run", action="store_true", help="Reuse the existing XML report instead of running Gradle")
+
+def add_context_args(context_p):
+    add_snapshot_args(context_p)
+    context_p.add_argument("--json", action="store_true", help="Emit structured JSON instead of colored text")
+    context_p.add_argument("--budget", type=int, metavar="TOKENS",
+                           help=f"Token budget for diff excerpts in the JSON output (default: {CONTEXT_BUDGET_TOKENS})")
+
+def add_perf_args(perf_p):
+    perf_sub = perf_p.add_subparsers(dest="perf_command", required=True)
+    startup_p = perf_sub.add_parser("startup", help="Measure cold/warm/hot app launch times on a device")
+    startup_p.add_argument("--runs", type=int, default=PERF_STARTUP_RUNS, help="Launches per mode (default: 10)")
+    startup_p.add_argument("--modes", default="cold,warm,hot", help="Comma-separated launch modes (default: all)")
+    startup_p.add_argument("--delay", type=float, default=1.0, help="Seconds to let the device settle between launches")
+    frames_p = perf_sub.add_parser("frames", help="Capture frame times and jank during a gameplay session")
+    frames_p.add_argument("--duration", type=float, help="Record for this many seconds instead of waiting for Enter")
+    frames_p.add_argument("--dump", help="Parse a recorded 'dumpsys gfxinfo' dump instead of capturing one")
+
+def add_size_args(size_p):
+    size_p.add_argument("target", nargs="?", choices=list(SIZE_ARTIFACTS), default="android", help="Artifact to analyze")
+    size_p.add_argument("--artifact", help="Path to an APK or JAR (default: the newest build output)")
+    size_p.add_argument("--budget", help="Fail if the download size exceeds this (e.g. 30MB)")
+    size_p.add_argument("--max-growth", type=float, metavar="PCT",
+                        help=f"Fail if the artifact grew more than PCT%% since the last build (default: {SIZE_GROWTH_BUDGET_PCT})")
+
+def add_db_args(db_p):
+    db_p.add_argument("--schema", help="Room schema JSON to use (default: newest exported version of each database)")
+    db_p.add_argument("--rows", action="append", metavar="TABLE=COUNT",
+                      help=f"Rows to generate for a table (default: {DB_DEFAULT_ROWS}, leaderboard 1,000,000)")
+    db_p.add_argument("--repeat", type=int, default=DB_QUERY_REPEAT, help="Timed runs per query (median is reported)")
+    db_p.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic data")
+    db_p.add_argument("--fresh", action="store_true", help="Regenerate the database even if it is up to date")
+    db_p.add_argument("--try-indexes", action="store_true", help="Re-time flagged queries with the suggested indexes")
+    db_p.add_argument("--verbose", action="store_true", help="Print the full query plan of every query")
+
+def add_watch_args(watch_p):
+    watch_p.add_argument("--module", action="append", help="Only watch this Gradle module (repeatable)")
+    watch_p.add_argument("--debounce", type=int, default=WATCH_DEBOUNCE_MS,
+                         help=f"Milliseconds to wait for a burst of saves to settle (default: {WATCH_DEBOUNCE_MS})")
+    watch_p.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify")
+    watch_p.add_argument("--verbose", action="store_true", help="Stream all Gradle output, not just test results")
+
+def add_codemod_args(codemod_p):
+    codemod_p.add_argument("rules", help="JSON rule file")
+    codemod_p.add_argument("--rule", action="append", help="Only apply the rule with this id (repeatable)")
+    codemod_p.add_argument("--write", action="store_true", help="Apply the changes (default is a dry run)")
+    codemod_p.add_argument("--diff", action="store_true", help="Print a unified diff of every change")
+    codemod_p.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+
+def add_doctor_args(doctor_p):
+    doctor_p.add_argument("--json", action="store_true", help="Print results as JSON")
+    doctor_p.add_argument("--refresh", action="store_true", help="Ignore cached tool versions")
+    doctor_p.add_argument("--timeout", type=float, default=DOCTOR_TIMEOUT_SECONDS,
+                          help=f"Seconds before a single check gives up (default: {DOCTOR_TIMEOUT_SECONDS})")
+
+def add_snapshot_args(sub_p):
+    sub_p.add_argument("--refresh", action="store_true", help="Ignore the cached git snapshot")
+
+def add_bench_args(bench_p):
+    import argparse
+    bench_p.add_argument("--filter", help="Only run benchmark classes whose name contains this text")
+    bench_p.add_argument("--threshold", type=float, default=BENCH_THRESHOLD_PCT,
+                         help=f"Allowed slowdown in percent before failing (default: {BENCH_THRESHOLD_PCT})")
+    bench_p.add_argument("--baseline", default=BENCH_BASELINE_REF,
+                         help=f"Compare against the recorded run for the merge-base with this ref (default: {BENCH_BASELINE_REF})")
+    bench_p.add_argument("--no-run", action="store_true", help="Parse existing JUnit results instead of running Gradle")
+    bench_sub = bench_p.add_subparsers(dest="bench_command")
+    compare_p = bench_sub.add_parser("compare", help="A/B benchmark two refs in throwaway worktrees")
+    compare_p.add_argument("ref_a", help="Baseline ref (A)")
+    compare_p.add_argument("ref_b", help="Candidate ref (B)")
+    compare_p.add_argument("--reps", type=int, default=6, help="Measured repetitions per ref (default: 6)")
+    compare_p.add_argument("--filter", default=argparse.SUPPRESS,
+                           help="Only run benchmark classes whose name contains this text")
+    compare_p.add_argument("--keep", action="store_true", help="Keep the worktrees after the comparison")
+
+def add_profile_args(profile_p):
+    profile_p.add_argument("--top", type=int, default=10, help="Number of tasks to show (default: 10)")
+    profile_p.add_argument("--runs", type=int, default=10, help="Number of runs in the trend view (default: 10)")
+
+def add_cache_args(cache_p):
+    cache_sub = cache_p.add_subparsers(dest="cache_command", required=True)
+    serve_p = cache_sub.add_parser("serve", help="Run a local Gradle HTTP build cache shared by all worktrees")
+    serve_p.add_argument("--port", type=int, default=BUILD_CACHE_PORT, help=f"Port (default: {BUILD_CACHE_PORT})")
+    serve_p.add_argument("--dir", default=BUILD_CACHE_DIR, help=f"Storage directory (default: {BUILD_CACHE_DIR})")
+    serve_p.add_argument("--max-size", type=float, default=BUILD_CACHE_MAX_BYTES / 1024 ** 3,
+                         help="Evict least recently used entries above this many GiB (default: 10)")
+    serve_p.add_argument("--no-wire", action="store_true", help="Do not point existing worktrees at the server")
+    stats_p = cache_sub.add_parser("stats", help="Show hit/miss statistics of the running server")
+    stats_p.add_argument("--port", type=int, default=BUILD_CACHE_PORT, help=f"Port (default: {BUILD_CACHE_PORT})")
+    cache_sub.add_parser("unwire", help="Stop worktree builds from using the shared cache")
+
+def add_trace_args(trace_p):
+    trace_sub = trace_p.add_subparsers(dest="trace_command", required=True)
+    last_p = trace_sub.add_parser("last", help="Summarize the slowest spans of the previous invocation")
+    last_p.add_argument("--top", type=int, default=15, help="Number of spans to show (default: 15)")
+
+# name -> (help, argument builder, handler)
+COMMANDS = {
+    "build": ("Build the project for various platforms", add_build_args, handle_build),
+    "test": ("Run project unit tests", add_test_args, handle_test),
+    "logs": ("Stream filtered Android logs with crash/ANR capture", add_logcat_args, handle_android_logs),
+    "task": ("Manage development tasks using Git Worktrees", add_task_args, handle_task),
+    "sync": ("Synchronize config files (.env, local.properties) to all workspaces", None, handle_sync),
+    "context": ("Generate high-signal summary for AI agents", add_context_args, handle_context),
+    "done": ("Verify task, format code, and prepare commit", None, handle_done),
+    "doctor": ("Check development environment for missing dependencies", add_doctor_args, handle_doctor),
+    "lint": ("Run linting and code style checks", add_lint_args, handle_lint),
+    "clean": ("Run gradle clean", None, handle_clean),
+    "open": ("Open project in IDE", add_open_args, handle_open),
+    "coverage": ("Generate and view code coverage reports", add_coverage_args, handle_coverage),
+    "status": ("Show unified project and worktree status", add_snapshot_args, handle_status),
+    "bench": ("Run *Perf*Test benchmarks and gate on regressions", add_bench_args, handle_bench),
+    "perf": ("Measure app performance on a connected Android device", add_perf_args, handle_perf),
+    "size": ("Break down APK/JAR size and track it per build", add_size_args, handle_size),
+    "db": ("Time DAO queries against a synthetic database built from the Room schema", add_db_args, handle_db),
+    "watch": ("Rerun the tests affected by each save", add_watch_args, handle_watch),
+    "codemod": ("Apply declarative find/replace rules across Kotlin sources", add_codemod_args, handle_codemod),
+    "cache": ("Serve a local Gradle build cache shared across worktrees", add_cache_args, handle_cache),
+    "profile": ("Show slow Gradle tasks and trends from --profile builds", add_profile_args, handle_profile),
+    "trace": ("Inspect Chrome traces recorded for previous mm invocations", add_trace_args, handle_trace),
+}
+
+def build_parser(command=None):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description=f"Memory-Match CLI v{APP_VERSION}",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"""
+{Colors.BOLD}Examples:{Colors.NC}
+  {Colors.GREEN}mm build android --run{Colors.NC}      Build and run Android app
+  {Colors.GREEN}mm task new feat scoreboard{Colors.NC}   Create a new task workspace
+  {Colors.GREEN}mm doctor{Colors.NC}                     Check environment health
+  {Colors.GREEN}mm context{Colors.NC}                    Generate AI summary
+  {Colors.GREEN}mm bench{Colors.NC}                      Run benchmarks and check for regressions
+"""
+    )
+    parser.add_argument("--no-banner", action="store_true", help="Do not display the ASCII art banner")
+    parser.add_argument("--timings", action="store_true",
+                        help=f"Report startup cost and fail if it exceeds {STARTUP_BUDGET_MS} ms")
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+    # Each subparser is a full ArgumentParser; when the command is known only its own is built
+    for name, (help_text, add_args, _) in COMMANDS.items():
+        if command and name != command:
+            continue
+        sub_p = subparsers.add_parser(name, help=help_text)
+        if add_args and name == command:
+            add_args(sub_p)
+    return parser
+
+def report_timings(phases, handler_ms):
+    startup_ms = sum(ms for _, ms in phases)
+    out = sys.stderr
+    out.write(f"\n{Colors.BOLD}Startup timings{Colors.NC}\n")
+    for label, ms in phases:
+        out.write(f"  {label:18} {ms:8.1f} ms\n")
+    if "project_root" in TIMINGS:
+        out.write(f"  {'project root':18} {TIMINGS['project_root']:8.1f} ms {Colors.GRAY}(resolved lazily){Colors.NC}\n")
+    else:
+        out.write(f"  {'project root':18} {Colors.GRAY}{'not needed':>11}{Colors.NC}\n")
+    out.write(f"  {'handler':18} {handler_ms:8.1f} ms\n")
+    color = Colors.GREEN if startup_ms <= STARTUP_BUDGET_MS else Colors.RED
+    out.write(f"  {'startup total':18} {color}{startup_ms:8.1f} ms{Colors.NC} {Colors.GRAY}(budget {STARTUP_BUDGET_MS} ms){Colors.NC}\n")
+    return startup_ms <= STARTUP_BUDGET_MS
+
+def main():
+    argv = sys.argv[1:]
+    if not argv:
+        build_parser().print_help()
+        sys.exit(0)
+
+    # Top-level options are all flags, so the first bare word is the command
+    command = next((a for a in argv if not a.startswith("-")), None)
+    # `mm --help build` asks for the top-level help, which lists every command
+    if command in argv and any(a in ("-h", "--help") for a in argv[:argv.index(command)]):
+        command = None
+    timings = "--timings" in argv
+    imported_at = time.perf_counter()
+    try:
+        args = build_parser(command if command in COMMANDS else None).parse_args(argv)
+    except SystemExit as e:
+        # `--help` and usage errors exit from inside argparse; still report when asked to
+        if timings and e.code == 0:
+            parsed_at = time.perf_counter()
+            within = report_timings([("module import", (imported_at - STARTED_AT) * 1000),
+                                     ("argument parsing", (parsed_at - imported_at) * 1000)], 0.0)
+            sys.exit(0 if within else 1)
+        raise
+    parsed_at = time.perf_counter()
+
+    if not args.no_banner and getattr(args, "subcommand", None) != "locate" and not getattr(args, "json", False):
+        print(ASCII_ART)
+        print(f"  {Colors.BOLD}Memory-Match CLI{Colors.NC} {Colors.GRAY}v{APP_VERSION}{Colors.NC}\n")
+
+    if args.command is None:
+        return
+    # Machine-facing queries stay side-effect free (and `trace last` must not shadow the trace it reads)
+    if args.command == "trace" or getattr(args, "subcommand", None) == "locate":
+        TRACER.enabled = False
+    TRACER.record("startup", "mm", STARTED_AT, parsed_at, {"argv": argv})
+    handler = COMMANDS[args.command][2]
+    try:
+        handler(args)
+    finally:
+        TRACER.write(args.command)
+        if args.timings:
+            handler_ms = (time.perf_counter() - parsed_at) * 1000 - TIMINGS.get("project_root", 0.0)
+            within = report_timings([("module import", (imported_at - STARTED_AT) * 1000),
+                                     ("argument parsing", (parsed_at - imported_at) * 1000)], handler_ms)
+            if not within:
+                error(f"Startup exceeded the {STARTUP_BUDGET_MS} ms budget.")
+
+if __name__ == "__main__":
+    main()